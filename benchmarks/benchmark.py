@@ -0,0 +1,199 @@
+"""
+Benchmarks the startup, routing and openapi generation of synthetic versioned apps.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.benchmark --versions 3 12 --routes 50 300 --output benchmark.json
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import fastapi
+import httpx
+from fastapi import FastAPI
+from pydantic import BaseModel, create_model
+
+import versioned_fastapi
+from versioned_fastapi import FastApiVersioner, version
+
+
+def create_models(count: int) -> List[type]:
+    """Creates pydantic models, each referencing the previous one."""
+    models: List[type] = []
+    for i in range(count):
+        fields: Dict[str, Any] = {"id": (int, ...), "name": (str, ...)}
+        if models:
+            fields["parent"] = (models[-1], None)
+        models.append(create_model(f"Model{i}", __base__=BaseModel, **fields))
+    return models
+
+
+def create_endpoint(model: type, is_post: bool) -> Callable:
+    """Creates an endpoint using the model as body or as response."""
+    if is_post:
+
+        async def create_resource(item_id: int, item: model) -> model:  # type: ignore[valid-type]
+            return item
+
+        return create_resource
+
+    async def get_resource(item_id: int) -> model:  # type: ignore[valid-type]
+        return model(id=item_id, name="name")
+
+    return get_resource
+
+
+def create_app(versions: int, routes: int, models: int) -> FastAPI:
+    """Creates an app with the given number of routes, each available in all versions."""
+    app = FastAPI(title="Benchmark API")
+    all_models = create_models(models)
+    all_versions = range(1, versions + 1)
+    for i in range(routes):
+        is_post = i % 2 == 1
+        endpoint = create_endpoint(all_models[i % models], is_post)
+        endpoint.__name__ = f"{endpoint.__name__}_{i}"
+        route = app.post if is_post else app.get
+        version(*all_versions)(route(f"/resources{i}/{{item_id}}")(endpoint))
+    return app
+
+
+async def measure_requests(app: FastAPI, path: str, requests: int) -> Dict[str, float]:
+    """Measures the latency of GET requests in microseconds."""
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            await client.get(path)
+            latencies.append((time.perf_counter() - start) * 1e6)
+    latencies.sort()
+    return {
+        "mean_us": statistics.fmean(latencies),
+        "median_us": statistics.median(latencies),
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+async def measure_openapi(app: FastAPI, path: str) -> Dict[str, float]:
+    """Measures the first (generating) and second (cached) request of an openapi definition in milliseconds."""
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        response = await client.get(path)
+        cold = time.perf_counter() - start
+        assert response.status_code == 200, (path, response.status_code)
+        start = time.perf_counter()
+        await client.get(path)
+        warm = time.perf_counter() - start
+    return {
+        "cold_ms": cold * 1e3,
+        "warm_ms": warm * 1e3,
+        "size_bytes": len(response.content),
+    }
+
+
+def run_benchmark(
+    versions: int, routes: int, models: int, requests: int, **versioner_kwargs: Any
+) -> Dict[str, Any]:
+    """Runs all measurements for one app configuration."""
+    result: Dict[str, Any] = {
+        "versions": versions,
+        "routes": routes,
+        "models": models,
+        **versioner_kwargs,
+    }
+
+    app = create_app(versions, routes, models)
+    gc.collect()
+    start = time.perf_counter()
+    FastApiVersioner(app, **versioner_kwargs).version_fastapi()
+    result["startup_ms"] = (time.perf_counter() - start) * 1e3
+
+    last_route = routes - 1 if routes % 2 == 1 else routes - 2
+    selected_versions = {"first": 1, "middle": (versions + 1) // 2, "last": versions}
+    result["routing"] = {
+        name: asyncio.run(
+            measure_requests(app, f"/v{v}/resources{last_route}/1", requests)
+        )
+        for name, v in selected_versions.items()
+    }
+    result["openapi"] = {
+        "version": asyncio.run(
+            measure_openapi(app, f"/v{selected_versions['middle']}/openapi.json")
+        ),
+        "all_routes": asyncio.run(measure_openapi(app, "/openapi.json")),
+    }
+
+    app = create_app(versions, routes, models)
+    gc.collect()
+    tracemalloc.start()
+    FastApiVersioner(app, **versioner_kwargs).version_fastapi()
+    asyncio.run(measure_openapi(app, f"/v{selected_versions['middle']}/openapi.json"))
+    result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+
+def main(args: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--versions", type=int, nargs="+", default=[3, 12])
+    parser.add_argument("--routes", type=int, nargs="+", default=[50, 300])
+    parser.add_argument("--models", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--dispatch", nargs="+", default=["routes", "prefix"])
+    parser.add_argument("--slice-openapi", action="store_true")
+    parser.add_argument("--output", help="The path of the JSON report.")
+    parsed = parser.parse_args(args)
+
+    results = []
+    for versions, routes, dispatch in itertools.product(
+        parsed.versions, parsed.routes, parsed.dispatch
+    ):
+        result = run_benchmark(
+            versions,
+            routes,
+            parsed.models,
+            parsed.requests,
+            dispatch=dispatch,
+            slice_openapi=parsed.slice_openapi,
+        )
+        results.append(result)
+        print(
+            f"versions={versions} routes={routes} dispatch={dispatch}: "
+            f"startup {result['startup_ms']:.1f} ms, "
+            f"routing last version {result['routing']['last']['median_us']:.0f} us, "
+            f"openapi {result['openapi']['version']['cold_ms']:.1f} ms, "
+            f"peak memory {result['peak_memory_bytes'] / 2**20:.1f} MiB",
+            file=sys.stderr,
+        )
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "fastapi": fastapi.__version__,
+            "versioned_fastapi": versioned_fastapi.__version__,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if parsed.output:
+        with open(parsed.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from versioned_fastapi import FastApiVersioner, version
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+class ItemV2(BaseModel):
+    id: int
+    name: str
+    description: str = ""
+
+
+class ItemV3(BaseModel):
+    id: int
+    name: str
+    description: str
+
+
+def upgrade_item(item: Item) -> ItemV3:
+    return ItemV3(id=item.id, name=item.name, description="Created by v1")
+
+
+def create_app(dispatch="routes"):
+    app = FastAPI()
+    db = {}
+
+    @version(
+        1,
+        2,
+        3,
+        upgrade={1: {"item": upgrade_item}, 2: {"item": ItemV2}},
+        downgrade={1: Item},
+    )
+    @app.post("/items", status_code=201)
+    async def create_item(item: ItemV3) -> ItemV3:
+        db[item.id] = item
+        return item
+
+    @version(1, 3, downgrade={1: Item})
+    @app.get("/items")
+    def get_items() -> List[ItemV3]:
+        return list(db.values())
+
+    versioner = FastApiVersioner(app, dispatch=dispatch)
+    versioner.version_fastapi()
+    return app, versioner
+
+
+@pytest.mark.parametrize("dispatch", ["routes", "prefix"])
+def test_converters(dispatch):
+    app, versioner = create_app(dispatch)
+    test_client = TestClient(app)
+
+    response = test_client.post("/v1/items", json={"id": 1, "name": "One"})
+    assert response.status_code == 201
+    assert response.json() == {"id": 1, "name": "One"}
+    response = test_client.post("/v2/items", json={"id": 2, "name": "Two"})
+    assert response.json() == {"id": 2, "name": "Two", "description": ""}
+    assert test_client.post("/v3/items", json={"id": 3, "name": "x"}).status_code == 422
+
+    assert test_client.get("/v1/items").json() == [
+        {"id": 1, "name": "One"},
+        {"id": 2, "name": "Two"},
+    ]
+    assert test_client.get("/v3/items").json()[0] == {
+        "id": 1,
+        "name": "One",
+        "description": "Created by v1",
+    }
+
+
+def test_converted_openapi():
+    app, versioner = create_app()
+
+    def get_schemas(version, method):
+        operation = versioner.openapi(version)["paths"][f"/v{version}/items"][method]
+        request = operation.get("requestBody", {})
+        request_schema = request.get("content", {}).get("application/json", {})
+        response = next(iter(operation["responses"].values()))
+        response_schema = response["content"]["application/json"]["schema"]
+        return request_schema.get("schema"), response_schema
+
+    ref = "#/components/schemas/{}".format
+    assert get_schemas(1, "post") == ({"$ref": ref("Item")}, {"$ref": ref("Item")})
+    assert get_schemas(2, "post") == ({"$ref": ref("ItemV2")}, {"$ref": ref("ItemV3")})
+    assert get_schemas(3, "post") == ({"$ref": ref("ItemV3")}, {"$ref": ref("ItemV3")})
+    assert get_schemas(1, "get")[1]["items"] == {"$ref": ref("Item")}
+    assert get_schemas(3, "get")[1]["items"] == {"$ref": ref("ItemV3")}
+
+
+def test_invalid_converters():
+    app = FastAPI()
+
+    @version(1, upgrade={1: {"unknown": Item}})
+    @app.get("/items")
+    async def get_items():
+        return []
+
+    with pytest.raises(ValueError, match="unknown"):
+        FastApiVersioner(app).version_fastapi()
+
+
+def test_model_upgrade_lacking_required_fields():
+    app = FastAPI()
+
+    @version(1, 2, upgrade={1: {"item": Item}})
+    @app.post("/items")
+    async def create_item(item: ItemV3) -> ItemV3:
+        return item
+
+    with pytest.raises(ValueError, match="description"):
+        FastApiVersioner(app, dispatch="prefix", lazy=True).version_fastapi()
+
+
+def test_optional_converters():
+    app = FastAPI()
+
+    @version(1, 2, upgrade={1: {"item": Item}}, downgrade={1: Item})
+    @app.put("/items/{item_id}")
+    async def update_item(
+        item_id: int, item: Optional[ItemV2] = None
+    ) -> Optional[ItemV2]:
+        return item
+
+    @version(1, 2, upgrade={1: {"item": upgrade_item}})
+    @app.post("/items")
+    async def create_item(item: ItemV3 = None) -> ItemV3:  # type: ignore[assignment]
+        return item or ItemV3(id=0, name="Default", description="")
+
+    FastApiVersioner(app).version_fastapi()
+    test_client = TestClient(app)
+
+    response = test_client.put("/v1/items/1", json={"id": 1, "name": "One"})
+    assert response.json() == {"id": 1, "name": "One"}
+    response = test_client.put("/v1/items/1")
+    assert response.status_code == 200
+    assert response.json() is None
+    assert test_client.post("/v1/items").json()["name"] == "Default"
+
+
+def test_unsupported_response_converter():
+    app = FastAPI()
+
+    @version(1, 2, downgrade={1: Item})
+    @app.get("/items")
+    async def get_items() -> Dict[str, ItemV2]:
+        return {}
+
+    with pytest.raises(ValueError, match="use a function"):
+        FastApiVersioner(app).version_fastapi()
+
+
+def test_diff_with_converters():
+    _, versioner = create_app()
+
+    assert versioner.diff(1, 3)["changed"] == [
+        {"path": "/items", "method": "GET", "changes": ["response"]},
+        {"path": "/items", "method": "POST", "changes": ["request", "response"]},
+    ]
+    assert versioner.diff(2, 3)["changed"] == [
+        {"path": "/items", "method": "POST", "changes": ["request"]},
+    ]
@@ -0,0 +1,135 @@
+from typing import Dict, List
+
+from fastapi import Depends, FastAPI
+from fastapi.security import OAuth2PasswordBearer
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.diff import describe_model, get_route_signature
+
+
+class Item(BaseModel):
+    id: int
+
+
+class ItemV3(BaseModel):
+    id: int
+    name: str
+
+
+def create_app():
+    app = FastAPI(title="Diff test API")
+
+    @version(1, 2, 3)
+    @app.get("/items")
+    async def get_items(limit: int = 10) -> list:
+        return []
+
+    @version(1, 2)
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> Item:
+        return Item(id=item_id)
+
+    @version(3)
+    @app.get("/items/{item_id}")
+    async def get_item_v3(item_id: int) -> ItemV3:
+        return ItemV3(id=item_id, name="")
+
+    @version(1)
+    @app.delete("/items/{item_id}")
+    async def delete_item(item_id: int) -> None:
+        pass
+
+    @version(2, 3)
+    @app.post("/items")
+    async def create_item(item: Item) -> Item:
+        return item
+
+    versioner = FastApiVersioner(app)
+    versioner.versions_diff_url = "/versions/diff"
+    versioner.version_fastapi()
+    return app, versioner
+
+
+def test_diff():
+    _, versioner = create_app()
+
+    assert versioner.diff(1, 2) == {
+        "from": "1",
+        "to": "2",
+        "added": [{"path": "/items", "method": "POST"}],
+        "removed": [{"path": "/items/{item_id}", "method": "DELETE"}],
+        "changed": [],
+    }
+    assert versioner.diff(2, 3)["changed"] == [
+        {
+            "path": "/items/{item_id}",
+            "method": "GET",
+            "changes": ["endpoint", "response"],
+        }
+    ]
+    assert versioner.diff(3, 3) == {
+        "from": "3",
+        "to": "3",
+        "added": [],
+        "removed": [],
+        "changed": [],
+    }
+    assert versioner.diff(1, 2) is versioner.diff("1", "2")
+
+
+def test_diff_endpoint():
+    app, versioner = create_app()
+    test_client = TestClient(app)
+
+    response = test_client.get("/versions/diff", params={"from": 1, "to": 3})
+    assert response.status_code == 200
+    assert response.json() == versioner.diff(1, 3)
+    assert test_client.get("/versions/diff", params={"from": 1}).status_code == 400
+    response = test_client.get("/versions/diff", params={"from": 1, "to": 4})
+    assert response.status_code == 404
+    assert response.json() == {"detail": 'Unknown version "4".'}
+
+
+def test_route_signature():
+    app = FastAPI()
+    oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+    def get_items() -> List[Item]:
+        return []
+
+    def get_secure_items(token: str = Depends(oauth2_scheme)) -> List[Item]:
+        return []
+
+    app.get("/items")(get_items)
+    app.get("/secure/items")(get_items)
+    app.get("/secure/items", dependencies=[Depends(oauth2_scheme)])(get_items)
+    app.get("/v3/items")(get_secure_items)
+    route, other_route, secure_route, token_route = app.routes[-4:]
+
+    signature = get_route_signature(route)
+    assert get_route_signature(other_route) == signature
+    assert get_route_signature(secure_route)["request"] != signature["request"]
+    assert get_route_signature(secure_route)["response"] == signature["response"]
+    assert get_route_signature(token_route)["request"] != signature["request"]
+
+    # Models are described by their fields, each model only once
+    models: Dict[type, str] = {}
+    get_route_signature(route, models)
+    assert set(models) == {Item}
+    assert describe_model(ItemV3, {}) != describe_model(Item, {})
+
+
+def test_route_signature_embedded_body():
+    app = FastAPI()
+
+    def create_items(item: Item, other: Item) -> Item:
+        return item
+
+    app.post("/items")(create_items)
+    app.post("/other/items")(create_items)
+    route, other_route = app.routes[-2:]
+
+    # The models of the embedded bodies are named after the routes
+    assert get_route_signature(route) == get_route_signature(other_route)
@@ -0,0 +1,297 @@
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import Body, FastAPI, Request
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.routing import VersionDispatcher, copy_route
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+def create_app(dispatch: str, **kwargs):
+    app = FastAPI(title="Dispatch test API")
+
+    @version(1)
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> Item:
+        return Item(id=item_id, name="v1")
+
+    @version(2, 3)
+    @app.get("/items/{item_id}")
+    async def get_item_v2(item_id: int, request: Request) -> dict:
+        return {
+            "id": item_id,
+            "url": str(request.url_for("get_item_v2", item_id=item_id)),
+        }
+
+    @version(2)
+    @app.post("/items", status_code=201)
+    async def create_item(item: Item) -> Item:
+        return item
+
+    @version(3)
+    @app.get("/")
+    async def root() -> str:
+        return "root"
+
+    @version(None)
+    @app.get("/health")
+    async def get_health() -> str:
+        return "OK"
+
+    versioner = FastApiVersioner(app, dispatch=dispatch, **kwargs)
+    versions = versioner.version_fastapi()
+    return app, versions
+
+
+def test_prefix_dispatch():
+    app, versions = create_app(dispatch="prefix")
+    assert versions == ["1", "2", "3"]
+    assert [type(r) for r in app.routes].count(VersionDispatcher) == 1
+    test_client = TestClient(app)
+
+    assert test_client.get("/health").text == '"OK"'
+    assert test_client.get("/v1/items/1").json() == {"id": 1, "name": "v1"}
+    assert test_client.get("/v2/items/2").json() == {
+        "id": 2,
+        "url": "http://testserver/v2/items/2",
+    }
+    assert test_client.get("/v3/items/3").json()["id"] == 3
+    assert test_client.post("/v2/items", json={"id": 4, "name": "4"}).status_code == 201
+    assert test_client.get("/v3/").text == '"root"'
+
+    assert test_client.get("/v3", follow_redirects=False).status_code == 307
+    assert test_client.post("/v1/items/1").status_code == 405
+    assert test_client.post("/v1/items", json={}).status_code == 404
+    assert test_client.get("/v1/items/a").status_code == 422
+    assert test_client.get("/v4/items/1").status_code == 404
+    assert test_client.get("/items/1").status_code == 404
+    assert test_client.get("/v1/health").status_code == 404
+
+
+def test_prefix_dispatch_root_path():
+    app, _ = create_app(dispatch="prefix")
+    main_app = FastAPI()
+    main_app.mount("/api", app)
+    test_client = TestClient(main_app)
+
+    assert test_client.get("/api/v1/items/1").status_code == 200
+    assert test_client.get("/api/v2/items/2").json()["url"] == (
+        "http://testserver/api/v2/items/2"
+    )
+    assert test_client.get("/api/v2/openapi.json").status_code == 200
+
+
+@pytest.mark.parametrize(
+    "path", ["/openapi.json", *(f"/v{v}/openapi.json" for v in (1, 2, 3))]
+)
+def test_prefix_dispatch_openapi(path):
+    routes_app, _ = create_app(dispatch="routes")
+    prefix_app, _ = create_app(dispatch="prefix")
+
+    assert TestClient(prefix_app).get(path).json() == (
+        TestClient(routes_app).get(path).json()
+    )
+
+
+def test_custom_openapi():
+    app, _ = create_app(dispatch="prefix")
+    main_openapi = app.openapi
+
+    def custom_openapi():
+        openapi_schema = main_openapi()
+        openapi_schema["info"]["x-custom"] = True
+        return openapi_schema
+
+    app.openapi = custom_openapi  # type: ignore[method-assign]
+    openapi_schema = TestClient(app).get("/openapi.json").json()
+    assert openapi_schema["info"]["x-custom"] is True
+    assert "/v2/items" in openapi_schema["paths"]
+
+    # A custom function assigned before is kept
+    app = FastAPI()
+    app.openapi = custom_openapi  # type: ignore[method-assign]
+    FastApiVersioner(app).version_fastapi()
+    assert app.openapi is custom_openapi
+
+
+def test_header_negotiation():
+    app, _ = create_app(
+        dispatch="prefix",
+        version_header="X-API-Version",
+        accept_version_parameter="version",
+    )
+    test_client = TestClient(app)
+
+    response = test_client.get("/items/1", headers={"X-API-Version": "1"})
+    assert response.json() == {"id": 1, "name": "v1"}
+    assert response.headers["vary"] == "x-api-version, accept"
+
+    response = test_client.get(
+        "/items/2", headers={"Accept": "application/vnd.example+json; version=2"}
+    )
+    assert response.json()["url"] == "http://testserver/v2/items/2"
+    assert response.headers["vary"] == "x-api-version, accept"
+
+    # The path prefix takes precedence
+    response = test_client.get("/v1/items/1", headers={"X-API-Version": "2"})
+    assert response.json() == {"id": 1, "name": "v1"}
+    assert "vary" not in response.headers
+
+    assert test_client.get("/items/1").status_code == 404
+    assert test_client.get("/items/1", headers={"X-API-Version": "9"}).status_code == (
+        404
+    )
+    assert test_client.get("/health", headers={"X-API-Version": "1"}).status_code == (
+        200
+    )
+    assert test_client.get("/docs", headers={"X-API-Version": "1"}).status_code == 200
+
+    dispatcher = next(r for r in app.routes if isinstance(r, VersionDispatcher))
+    assert (b"1", b"*/*") in dispatcher._negotiated_versions
+    assert dispatcher._negotiated_versions[(b"9", b"*/*")] is None
+
+
+def test_invalid_dispatch():
+    with pytest.raises(ValueError):
+        FastApiVersioner(FastAPI(), dispatch="unknown")  # type: ignore[arg-type]
+    with pytest.raises(ValueError):
+        FastApiVersioner(FastAPI(), version_header="X-API-Version")
+    with pytest.raises(ValueError):
+        FastApiVersioner(FastAPI(), lazy=True)
+
+
+def test_copy_route():
+    app = FastAPI()
+
+    @app.post("/items/{item_id}")
+    async def update_item(item_id: int, item: Item) -> Item:
+        return item
+
+    route = app.routes[-1]
+    prefixed_route = copy_route(route, "/v2")
+
+    assert type(prefixed_route) is type(route)
+    assert prefixed_route.path == "/v2/items/{item_id}"
+    assert prefixed_route.path_regex.match("/v2/items/1")
+    assert prefixed_route.unique_id == "update_item_v2_items__item_id__post"
+    assert route.path == "/items/{item_id}"
+    assert route.unique_id == "update_item_items__item_id__post"
+    assert prefixed_route.dependant is route.dependant
+    assert prefixed_route.body_field is route.body_field
+    assert prefixed_route.response_field is route.response_field
+    assert prefixed_route.app is route.app
+
+
+@pytest.mark.parametrize("dispatch", ["routes", "prefix"])
+def test_embedded_bodies_in_main_openapi(dispatch):
+    app = FastAPI()
+
+    def add_create_item(version_number: int):
+        @version(version_number)
+        @app.post("/items")
+        async def create_item(item: Item, count: int = Body()) -> Item:
+            return item
+
+    add_create_item(1)
+    add_create_item(2)
+    FastApiVersioner(app, dispatch=dispatch).version_fastapi()
+    test_client = TestClient(app)
+
+    schemas = test_client.get("/openapi.json").json()["components"]["schemas"]
+    assert {"Body_create_item_v1_items_post", "Body_create_item_v2_items_post"} <= set(
+        schemas
+    )
+    # The definitions of the versions keep the body names of the endpoints
+    schemas = test_client.get("/v1/openapi.json").json()["components"]["schemas"]
+    assert "Body_create_item_items_post" in schemas
+    response = test_client.post(
+        "/v2/items", json={"item": {"id": 1, "name": "One"}, "count": 2}
+    )
+    assert response.json() == {"id": 1, "name": "One"}
+
+
+def test_lazy_versions():
+    app = FastAPI(title="Lazy test API")
+    created_versions = []
+
+    for v in (1, 2, 3):
+
+        @version(v)
+        @app.get("/items", name=f"get_items_v{v}")
+        async def get_items() -> list:
+            return []
+
+    versioner = FastApiVersioner(app, dispatch="prefix", lazy=True)
+    assert versioner.version_fastapi() == ["1", "2", "3"]
+    dispatcher = next(r for r in app.routes if isinstance(r, VersionDispatcher))
+    create_dispatched_routes = versioner._create_dispatched_routes
+
+    def count_created_routes(version, routes):
+        created_versions.append(version)
+        return create_dispatched_routes(version, routes)
+
+    for v, factory in dispatcher._route_factories.items():
+        dispatcher._route_factories[v] = functools.partial(
+            count_created_routes, *factory.args
+        )
+    assert dispatcher.routes_by_version == {}
+
+    test_client = TestClient(app)
+    assert test_client.get("/v2/items").status_code == 200
+    assert test_client.get("/v2/openapi.json").status_code == 200
+    assert test_client.get("/v4/items").status_code == 404
+    assert created_versions == ["2"]
+
+    versioner.warmup([1])
+    assert created_versions == ["2", "1"]
+    assert set(versioner._openapi_cache) == {"1", "2"}
+    with pytest.raises(ValueError, match='Unknown version "9"'):
+        versioner.warmup([9])
+    with pytest.raises(ValueError, match='Unknown version "9"'):
+        versioner.openapi(9)
+
+    # The main openapi definition contains all versions in their original order
+    paths = list(test_client.get("/openapi.json").json()["paths"])
+    assert paths == ["/v1/items", "/v2/items", "/v3/items"]
+    assert created_versions == ["2", "1", "3"]
+
+
+def test_lazy_versions_concurrent():
+    dispatcher = VersionDispatcher("/v{version}")
+    calls = []
+
+    def create_routes():
+        calls.append(1)
+        time.sleep(0.01)
+        return []
+
+    dispatcher.add_lazy_version("1", create_routes)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(dispatcher.get_routes, ["1"] * 8))
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert dispatcher.get_routes("2") is None
+
+
+def test_prefixed_routes_are_created_for_openapi():
+    app, _ = create_app(dispatch="prefix")
+    versioner = app.state.versioner
+    assert versioner._prefixed_routes == {}
+
+    test_client = TestClient(app)
+    assert test_client.get("/v2/items/1").status_code == 200
+    assert versioner._prefixed_routes == {}
+
+    paths = test_client.get("/v2/openapi.json").json()["paths"]
+    assert set(paths) == {"/v2/items/{item_id}", "/v2/items"}
+    assert set(versioner._prefixed_routes) == {"2"}
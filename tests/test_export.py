@@ -0,0 +1,78 @@
+import gzip
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.__main__ import import_versioner, main
+
+
+def create_app(**kwargs):
+    app = FastAPI(title="Export test API")
+
+    @version(1, 2)
+    @app.get("/items")
+    async def get_items() -> list:
+        return []
+
+    @version(2)
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> dict:
+        return {"id": item_id}
+
+    versioner = FastApiVersioner(app, **kwargs)
+    versioner.version_fastapi()
+    return app, versioner
+
+
+def test_export(tmp_path):
+    app, versioner = create_app()
+    paths = versioner.export(tmp_path, root_path="/api")
+    assert [p.relative_to(tmp_path).as_posix() for p in paths] == [
+        "openapi.json",
+        "v1/openapi.json",
+        "v2/openapi.json",
+        "docs/index.html",
+    ]
+    test_client = TestClient(app)
+
+    for url in ("/openapi.json", "/v1/openapi.json", "/v2/openapi.json"):
+        path = tmp_path / url.lstrip("/")
+        assert path.read_bytes() == test_client.get(url).content
+    v2_path = tmp_path / "v2" / "openapi.json"
+    assert gzip.decompress((tmp_path / "v2" / "openapi.json.gz").read_bytes()) == (
+        v2_path.read_bytes()
+    )
+    docs = (tmp_path / "docs" / "index.html").read_text()
+    assert "/api/v2/openapi.json" in docs
+
+
+def test_openapi_dir(tmp_path):
+    _, versioner = create_app()
+    versioner.export(tmp_path)
+    v1_path = tmp_path / "v1" / "openapi.json"
+    v1_path.write_text(json.dumps({"exported": True}))
+    (tmp_path / "openapi.json").write_text(json.dumps({"exported": "main"}))
+
+    app, versioner = create_app(openapi_dir=tmp_path)
+    test_client = TestClient(app)
+
+    response = test_client.get("/v1/openapi.json")
+    assert response.json() == {"exported": True}
+    response = test_client.get("/v2/openapi.json")
+    assert response.json() == versioner.openapi(2)
+    assert test_client.get("/openapi.json").json() == {"exported": "main"}
+
+
+def test_cli(tmp_path, capsys):
+    main(["export", "examples.customization:app", "--out", str(tmp_path)])
+
+    assert (tmp_path / "version1" / "swagger.json").is_file()
+    assert (tmp_path / "swagger" / "index.html").is_file()
+    assert str(tmp_path / "version1" / "swagger.json") in capsys.readouterr().out
+
+
+def test_import_versioner():
+    versioner = import_versioner("examples.simple:app")
+    assert versioner.app.state.versioner is versioner
@@ -0,0 +1,120 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+
+
+def create_app(dispatch: str):
+    app = FastAPI(title="Mounts test API")
+
+    @version(1, 2)
+    @app.get("/items")
+    async def get_items() -> list:
+        return []
+
+    admin_app = FastAPI(title="Admin API")
+
+    @version(1)
+    @admin_app.get("/")
+    async def admin_root() -> str:
+        return "admin v1"
+
+    @version(2)
+    @admin_app.get("/users/{user_id}")
+    async def get_user(user_id: int, request: Request) -> str:
+        return str(request.url_for("get_user", user_id=user_id))
+
+    @version(None)
+    @admin_app.get("/health")
+    async def admin_health() -> str:
+        return "OK"
+
+    reports_app = FastAPI()
+
+    @version(2)
+    @reports_app.get("/reports")
+    async def get_reports() -> list:
+        return []
+
+    admin_app.mount("/sub", reports_app)
+    app.mount("/admin", admin_app)
+
+    versioner = FastApiVersioner(app, dispatch=dispatch, include_mounts=True)
+    return app, versioner, versioner.version_fastapi()
+
+
+@pytest.mark.parametrize("dispatch", ["routes", "prefix"])
+def test_include_mounts(dispatch):
+    app, versioner, versions = create_app(dispatch)
+    assert versions == ["1", "2"]
+    test_client = TestClient(app)
+
+    assert test_client.get("/v1/items").status_code == 200
+    assert test_client.get("/admin/v1/").text == '"admin v1"'
+    assert test_client.get("/admin/v2/users/1").text == (
+        '"http://testserver/admin/v2/users/1"'
+    )
+    assert test_client.get("/admin/sub/v2/reports").status_code == 200
+    assert test_client.get("/admin/health").text == '"OK"'
+    assert test_client.get("/admin/v1/users/1").status_code == 404
+    assert test_client.get("/admin/").status_code == 404
+    assert test_client.get("/v1/admin/").status_code == 404
+
+    # One definition per version and one docs page include the routes of all apps
+    paths = test_client.get("/v2/openapi.json").json()["paths"]
+    assert list(paths) == [
+        "/v2/items",
+        "/admin/v2/users/{user_id}",
+        "/admin/sub/v2/reports",
+    ]
+    assert "/admin/v1/" in test_client.get("/openapi.json").json()["paths"]
+    assert set(versioner._route_table) >= {
+        ("1", "/admin/", "GET"),
+        ("2", "/admin/sub/reports", "GET"),
+    }
+
+
+def test_include_mounts_skips_versioned_apps():
+    app = FastAPI()
+    admin_app = FastAPI()
+
+    @version(1)
+    @admin_app.get("/")
+    async def admin_root() -> str:
+        return "admin"
+
+    FastApiVersioner(admin_app).version_fastapi()
+    app.mount("/admin", admin_app)
+    versions = FastApiVersioner(app, include_mounts=True).version_fastapi()
+
+    assert versions == []
+    assert TestClient(app).get("/admin/v1/").status_code == 200
+
+
+@pytest.mark.parametrize("handling", ["middleware", "exception_handler"])
+def test_include_mounts_rejects_apps_with_own_handling(handling):
+    app = FastAPI()
+    admin_app = FastAPI()
+
+    @version(1)
+    @admin_app.get("/")
+    async def admin_root() -> str:
+        return "admin"
+
+    if handling == "middleware":
+
+        @admin_app.middleware("http")
+        async def authenticate(request: Request, call_next):
+            return PlainTextResponse("Unauthorized", status_code=401)
+
+    else:
+
+        @admin_app.exception_handler(ValueError)
+        async def handle_value_error(request: Request, exc: ValueError):
+            return PlainTextResponse("Bad value", status_code=400)
+
+    app.mount("/admin", admin_app)
+    with pytest.raises(ValueError, match='"/admin"'):
+        FastApiVersioner(app, include_mounts=True).version_fastapi()
@@ -0,0 +1,82 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+
+
+def create_app(**kwargs):
+    app = FastAPI(title="Incremental test API")
+
+    @version(1, 2)
+    @app.get("/items")
+    async def get_items() -> list:
+        return []
+
+    @version(None)
+    @app.get("/health")
+    async def get_health() -> str:
+        return "OK"
+
+    versioner = FastApiVersioner(app, **kwargs)
+    return app, versioner
+
+
+def create_plugin_router():
+    router = APIRouter()
+
+    @version(2, 3)
+    @router.get("/plugin")
+    async def get_plugin() -> str:
+        return "plugin"
+
+    return router
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"dispatch": "routes"},
+        {"dispatch": "prefix"},
+        {"dispatch": "prefix", "lazy": True},
+        {"dispatch": "routes", "inherit_routes": True},
+    ],
+)
+def test_version_fastapi_again(kwargs):
+    app, versioner = create_app(**kwargs)
+    assert versioner.version_fastapi() == ["1", "2"]
+    test_client = TestClient(app)
+    v1_openapi = test_client.get("/v1/openapi.json").json()
+    test_client.get("/v2/openapi.json")
+    test_client.get("/openapi.json")
+    v1_content = versioner._openapi_cache["1"]
+    route_count = len(app.routes)
+
+    app.include_router(create_plugin_router())
+    assert versioner.version_fastapi() == ["1", "2", "3"]
+
+    # Only the versions with new routes are invalidated
+    assert versioner._openapi_cache == {"1": v1_content}
+    assert test_client.get("/v1/openapi.json").json() == v1_openapi
+    assert test_client.get("/v2/plugin").text == '"plugin"'
+    assert test_client.get("/v3/plugin").text == '"plugin"'
+    assert test_client.get("/v1/plugin").status_code == 404
+    assert test_client.get("/v2/items").status_code == 200
+    assert test_client.get("/health").status_code == 200
+    assert test_client.get("/plugin").status_code == 404
+    if kwargs.get("inherit_routes"):
+        assert test_client.get("/v3/items").status_code == 200
+
+    assert "/v2/plugin" in test_client.get("/v2/openapi.json").json()["paths"]
+    assert "/v3/plugin" in test_client.get("/openapi.json").json()["paths"]
+    assert "Version 3" in test_client.get("/docs").text
+    paths = [getattr(r, "path", None) for r in app.routes]
+    assert paths.count("/docs") == 1
+    assert paths.count("/v2/items") == (kwargs["dispatch"] == "routes")
+
+    # Without new routes nothing changes
+    routes = list(app.routes)
+    assert versioner.version_fastapi() == ["1", "2", "3"]
+    assert app.routes == routes
+    if kwargs["dispatch"] == "prefix":
+        assert len(app.routes) == route_count
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.routing import VersionDispatcher
+
+
+def create_app(dispatch: str):
+    app = FastAPI(title="Inheritance test API")
+
+    @version(1)
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> dict:
+        return {"id": item_id, "version": 1}
+
+    @version(1)
+    @app.post("/items")
+    async def create_item() -> int:
+        return 1
+
+    @version(2)
+    @app.get("/items/{item_id}")
+    async def get_item_v2(item_id: int) -> dict:
+        return {"id": item_id, "version": 2}
+
+    @version(3)
+    @app.get("/users")
+    async def get_users() -> list:
+        return []
+
+    versioner = FastApiVersioner(app, dispatch=dispatch, inherit_routes=True)
+    versions = versioner.version_fastapi()
+    return app, versioner, versions
+
+
+@pytest.mark.parametrize("dispatch", ["routes", "prefix"])
+def test_inherit_routes(dispatch):
+    app, versioner, versions = create_app(dispatch)
+    assert versions == ["1", "2", "3"]
+    test_client = TestClient(app)
+
+    assert test_client.get("/v1/items/1").json() == {"id": 1, "version": 1}
+    assert test_client.get("/v2/items/1").json() == {"id": 1, "version": 2}
+    assert test_client.get("/v3/items/1").json() == {"id": 1, "version": 2}
+    for v in (1, 2, 3):
+        assert test_client.post(f"/v{v}/items").json() == 1
+    assert test_client.get("/v2/users").status_code == 404
+    assert test_client.get("/v3/users").status_code == 200
+
+    v3_paths = test_client.get("/v3/openapi.json").json()["paths"]
+    assert set(v3_paths) == {"/v3/items/{item_id}", "/v3/items", "/v3/users"}
+    assert v3_paths["/v3/items/{item_id}"]["get"]["operationId"] == (
+        "get_item_v2_v3_items__item_id__get"
+    )
+
+    route_table = versioner._route_table
+    assert route_table["3", "/items/{item_id}", "GET"].name == "get_item_v2"
+    assert route_table["3", "/items", "POST"].name == "create_item"
+    assert ("2", "/users", "GET") not in route_table
+
+    if dispatch == "prefix":
+        dispatcher = next(r for r in app.routes if isinstance(r, VersionDispatcher))
+        inherited_route = route_table["3", "/items/{item_id}", "GET"]
+        assert inherited_route in dispatcher.routes_by_version["3"]
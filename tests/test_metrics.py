@@ -0,0 +1,91 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.metrics import RequestMetrics, opentelemetry_sink
+
+
+def create_app(metrics: RequestMetrics, **kwargs):
+    app = FastAPI(title="Metrics test API")
+
+    @version(1, 2)
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> dict:
+        return {"id": item_id}
+
+    @version(None)
+    @app.get("/health")
+    async def get_health() -> str:
+        return "OK"
+
+    versioner = FastApiVersioner(app, metrics=metrics, **kwargs)
+    versioner.metrics_url = "/metrics"
+    versioner.version_fastapi()
+    return app
+
+
+@pytest.mark.parametrize("dispatch", ["routes", "prefix"])
+def test_metrics(dispatch):
+    records = []
+    metrics = RequestMetrics(sinks=[lambda *args: records.append(args)])
+    test_client = TestClient(create_app(metrics, dispatch=dispatch))
+
+    test_client.get("/v1/items/1")
+    test_client.get("/v1/items/2")
+    test_client.get("/v2/items/1")
+    test_client.get("/health")
+    test_client.get("/v3/items/1")
+
+    assert [r[:3] for r in records] == [
+        ("1", "GET", "/items/{item_id}"),
+        ("1", "GET", "/items/{item_id}"),
+        ("2", "GET", "/items/{item_id}"),
+    ]
+    assert all(0 < r[3] < 1 for r in records)
+    histogram = metrics.histograms["1", "GET", "/items/{item_id}"]
+    assert sum(histogram.bucket_counts) == 2
+
+    response = test_client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert lines[1] == "# TYPE versioned_fastapi_request_duration_seconds histogram"
+    labels = 'version="2",method="GET",route="/items/{item_id}"'
+    assert (
+        f'versioned_fastapi_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1'
+        in lines
+    )
+    assert f"versioned_fastapi_request_duration_seconds_count{{{labels}}} 1" in lines
+
+
+def test_metrics_sampling():
+    metrics = RequestMetrics(sample_rate=0.25)
+    test_client = TestClient(create_app(metrics, dispatch="prefix"))
+    for _ in range(10):
+        test_client.get("/v1/items/1")
+
+    histogram = metrics.histograms["1", "GET", "/items/{item_id}"]
+    # Two of ten requests were sampled, each is counted four times
+    assert sum(histogram.bucket_counts) == 8
+
+    with pytest.raises(ValueError):
+        RequestMetrics(sample_rate=0)
+
+
+def test_opentelemetry_sink():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+    reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[reader]).get_meter("test")
+    metrics = RequestMetrics(sinks=[opentelemetry_sink(meter)])
+    TestClient(create_app(metrics)).get("/v2/items/1")
+
+    metric = reader.get_metrics_data().resource_metrics[0].scope_metrics[0].metrics[0]
+    assert metric.name == "versioned_fastapi.request.duration"
+    assert dict(metric.data.data_points[0].attributes) == {
+        "version": "2",
+        "http.request.method": "GET",
+        "http.route": "/items/{item_id}",
+    }
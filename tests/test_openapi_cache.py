@@ -0,0 +1,258 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.responses import CachedContent, ChunkedContent, serialize_json
+
+
+def create_app(**kwargs):
+    app = FastAPI(title="Cache test API")
+
+    @version(1, 2)
+    @app.get("/items")
+    async def get_items() -> list:
+        return []
+
+    @version(1, 2)
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> dict:
+        return {"id": item_id}
+
+    versioner = FastApiVersioner(app, **kwargs)
+    versioner.version_fastapi()
+    return app, versioner
+
+
+def test_openapi_is_cached():
+    app, versioner = create_app()
+    test_client = TestClient(app)
+
+    response = test_client.get("/v1/openapi.json")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == versioner.openapi(1)
+    assert set(versioner._openapi_cache) == {"1"}
+
+    cached_content = versioner._openapi_cache["1"]
+    assert test_client.get("/v1/openapi.json").content == cached_content.body
+    assert versioner._openapi_cache["1"] is cached_content
+
+
+def test_invalidate_openapi():
+    app, versioner = create_app()
+    test_client = TestClient(app)
+    test_client.get("/v1/openapi.json")
+    test_client.get("/v2/openapi.json")
+
+    versioner.invalidate_openapi(version=1)
+    assert set(versioner._openapi_cache) == {"2"}
+
+    versioner.invalidate_openapi()
+    assert versioner._openapi_cache == {}
+    assert test_client.get("/v2/openapi.json").status_code == 200
+
+
+def test_openapi_etag():
+    app, versioner = create_app()
+    test_client = TestClient(app)
+
+    response = test_client.get("/v1/openapi.json")
+    etag = response.headers["etag"]
+    assert "cache-control" not in response.headers
+    assert etag != test_client.get("/v2/openapi.json").headers["etag"]
+
+    response = test_client.get("/v1/openapi.json", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    for if_none_match in (f'"other", W/{etag}', "*"):
+        response = test_client.get(
+            "/v1/openapi.json", headers={"If-None-Match": if_none_match}
+        )
+        assert response.status_code == 304
+
+    response = test_client.get("/v1/openapi.json", headers={"If-None-Match": '"x"'})
+    assert response.status_code == 200
+
+
+def test_docs_etag_and_cache_control():
+    app, versioner = create_app()
+    versioner.cache_control = "public, max-age=60"
+    test_client = TestClient(app)
+
+    response = test_client.get("/docs")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=60"
+    assert response.headers["content-type"].startswith("text/html")
+
+    response = test_client.get(
+        "/docs", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == "public, max-age=60"
+    assert test_client.get("/v1/openapi.json").headers["cache-control"] == (
+        "public, max-age=60"
+    )
+
+
+def test_openapi_compression():
+    app, versioner = create_app()
+    test_client = TestClient(app)
+
+    identity_response = test_client.get(
+        "/v1/openapi.json", headers={"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in identity_response.headers
+    assert identity_response.headers["vary"] == "Accept-Encoding"
+
+    gzip_response = test_client.get(
+        "/v1/openapi.json", headers={"Accept-Encoding": "gzip"}
+    )
+    assert gzip_response.headers["content-encoding"] == "gzip"
+    assert gzip_response.json() == identity_response.json()
+    assert gzip_response.headers["etag"] != identity_response.headers["etag"]
+    assert "gzip" in versioner._openapi_cache["1"].encoded_bodies
+
+    response = test_client.get(
+        "/v1/openapi.json",
+        headers={"Accept-Encoding": "gzip;q=0, deflate"},
+    )
+    assert "content-encoding" not in response.headers
+
+    response = test_client.get(
+        "/v1/openapi.json",
+        headers={
+            "Accept-Encoding": "gzip",
+            "If-None-Match": gzip_response.headers["etag"],
+        },
+    )
+    assert response.status_code == 304
+
+
+def test_openapi_compression_disabled():
+    app, versioner = create_app()
+    versioner.compression_minimum_size = None
+    test_client = TestClient(app)
+
+    response = test_client.get("/v1/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert versioner._openapi_cache["1"].encoded_bodies == {}
+
+
+def test_openapi_brotli():
+    pytest.importorskip("brotli")
+    app, versioner = create_app()
+    test_client = TestClient(app)
+
+    response = test_client.get(
+        "/v1/openapi.json", headers={"Accept-Encoding": "gzip, br"}
+    )
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == versioner.openapi(1)
+
+
+def test_openapi_single_flight():
+    app, versioner = create_app()
+    generated_versions = []
+    generation_started = threading.Event()
+    openapi = versioner.openapi
+
+    def slow_openapi(version):
+        generated_versions.append(version)
+        generation_started.set()
+        time.sleep(0.2)
+        return openapi(version)
+
+    versioner.openapi = slow_openapi  # type: ignore[method-assign]
+
+    async def request_all():
+        transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            openapi_requests = [client.get("/v1/openapi.json") for _ in range(5)]
+
+            async def get_item():
+                # The event loop must not be blocked by the generation
+                while not generation_started.is_set():
+                    await asyncio.sleep(0.001)
+                start = time.perf_counter()
+                response = await client.get("/v1/items/1")
+                return response, time.perf_counter() - start
+
+            return await asyncio.gather(get_item(), *openapi_requests)
+
+    (item_response, item_duration), *responses = asyncio.run(request_all())
+    assert generated_versions == ["1"]
+    assert item_response.status_code == 200
+    assert item_duration < 0.1
+    assert all(r.content == responses[0].content for r in responses)
+    assert versioner._openapi_futures == {}
+
+
+def test_openapi_serializer():
+    def serialize_indented(content):
+        return json.dumps(content, indent=2).encode()
+
+    app, versioner = create_app(serializer=serialize_indented)
+    response = TestClient(app).get("/v1/openapi.json")
+
+    assert response.content == serialize_indented(versioner.openapi(1))
+
+
+def test_serialize_json():
+    content = {"title": "Äpfel", "values": [1, 2.5, None, True]}
+    assert serialize_json(content) == json.dumps(
+        content, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def test_brotli_quality(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    body = json.dumps({str(i): "value" * i for i in range(100)}).encode()
+    assert CachedContent(body, "application/json", 0).encoded_bodies["br"] == (
+        brotli.compress(body, quality=5)
+    )
+
+    monkeypatch.setattr(CachedContent, "brotli_quality", 1)
+    assert CachedContent(body, "application/json", 0).encoded_bodies["br"] == (
+        brotli.compress(body, quality=1)
+    )
+    chunks = ChunkedContent([body], "application/json", 0).encoded_chunks["br"]
+    assert brotli.decompress(b"".join(chunks)) == body
+
+
+def test_openapi_generation_survives_cancelled_request():
+    app, versioner = create_app()
+    generation_started = threading.Event()
+    openapi = versioner.openapi
+
+    def slow_openapi(version):
+        generation_started.set()
+        time.sleep(0.2)
+        return openapi(version)
+
+    versioner.openapi = slow_openapi  # type: ignore[method-assign]
+
+    async def request_and_cancel():
+        first = asyncio.ensure_future(versioner._get_openapi_content_async("1"))
+        while not generation_started.is_set():
+            await asyncio.sleep(0.001)
+        second = asyncio.ensure_future(versioner._get_openapi_content_async("1"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    content = asyncio.run(request_and_cancel())
+    assert content is versioner._openapi_cache["1"]
+    assert versioner._openapi_futures == {}
@@ -0,0 +1,114 @@
+import mmap
+import os
+import threading
+import time
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.security import OAuth2PasswordBearer
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.cache import FileCache
+from versioned_fastapi.responses import CachedContent, ChunkedContent
+
+
+def create_app(cache_dir, item_type=dict, app_version="0.1.0", **route_kwargs):
+    app = FastAPI(title="Shared cache test API", version=app_version)
+
+    @version(1, 2)
+    @app.get("/items/{item_id}", **route_kwargs)
+    async def get_item(item_id: int) -> item_type:
+        return {"id": item_id}
+
+    versioner = FastApiVersioner(app, cache_dir=cache_dir)
+    versioner.version_fastapi()
+    return app, versioner
+
+
+def test_openapi_is_shared(tmp_path):
+    app, versioner = create_app(tmp_path)
+    response = TestClient(app).get("/v1/openapi.json")
+    assert response.json() == versioner.openapi(1)
+
+    other_app, other_versioner = create_app(tmp_path)
+
+    def fail(version):
+        raise AssertionError("The openapi definition should be read from the cache")
+
+    other_versioner.openapi = fail  # type: ignore[method-assign]
+    test_client = TestClient(other_app)
+    other_response = test_client.get("/v1/openapi.json")
+    assert other_response.content == response.content
+    assert other_response.headers["etag"] == response.headers["etag"]
+    gzip_response = test_client.get(
+        "/v1/openapi.json", headers={"Accept-Encoding": "gzip"}
+    )
+    assert gzip_response.headers["content-encoding"] == "gzip"
+    assert not list(tmp_path.glob("*.lock")) and not list(tmp_path.glob("*.tmp"))
+
+
+def test_cache_key():
+    _, versioner = create_app(None)
+    _, same_versioner = create_app(None)
+    _, other_versioner = create_app(None, item_type=list)
+
+    key = versioner._get_cache_key("1")
+    assert key == same_versioner._get_cache_key("1")
+    assert key != versioner._get_cache_key("2")
+    assert key != other_versioner._get_cache_key("1")
+
+    oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+    _, secure_versioner = create_app(None, dependencies=[Depends(oauth2_scheme)])
+    assert key != secure_versioner._get_cache_key("1")
+
+    callback_router = APIRouter()
+    callback_router.post("{$callback_url}/items")(lambda: None)
+    _, callback_versioner = create_app(None, callbacks=callback_router.routes)
+    assert key != callback_versioner._get_cache_key("1")
+
+    _, released_versioner = create_app(None, app_version="1.0.0")
+    assert key != released_versioner._get_cache_key("1")
+
+
+def test_file_cache_waits_for_lock(tmp_path):
+    cache = FileCache(tmp_path)
+    cache.poll_interval = 0.01
+    (tmp_path / "key.json.lock").touch()
+
+    def write():
+        FileCache._write(
+            tmp_path / "key.json", CachedContent(b"{}", "application/json")
+        )
+
+    timer = threading.Timer(0.05, write)
+    timer.start()
+    content = cache.get(
+        "key.json", "application/json", lambda: CachedContent(b"[]", "application/json")
+    )
+    timer.join()
+    assert content.body == b"{}"
+
+    # The lock of a killed process is taken over once it is stale
+    lock_path = tmp_path / "new.json.lock"
+    lock_path.touch()
+    os.utime(lock_path, (time.time() - 120, time.time() - 120))
+    start = time.monotonic()
+    content = cache.get(
+        "new.json", "application/json", lambda: CachedContent(b"[]", "application/json")
+    )
+    assert time.monotonic() - start < 1
+    assert content.body == b"[]"
+    assert (tmp_path / "new.json").read_bytes() == b"[]"
+    assert not lock_path.exists() and not list(tmp_path.glob("*.tmp"))
+
+
+def test_openapi_is_mapped(tmp_path):
+    app, versioner = create_app(tmp_path)
+    response = TestClient(app).get("/v1/openapi.json")
+
+    content = versioner._openapi_cache["1"]
+    assert isinstance(content, ChunkedContent)
+    assert all(isinstance(c.obj, mmap.mmap) for c in content.chunks)
+    path = tmp_path / versioner._get_cache_key("1")
+    assert response.content == content.body == path.read_bytes()
+    assert isinstance(content.encoded_chunks["gzip"][0].obj, mmap.mmap)
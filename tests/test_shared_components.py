@@ -0,0 +1,110 @@
+import json
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, create_model
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.openapi import get_schema_refs, share_components
+
+SHARED_REF = "../openapi-components.json#/components/schemas/"
+
+
+class Tag(BaseModel):
+    name: str
+
+
+class Item(BaseModel):
+    id: int
+    tags: List[Tag]
+
+
+ThingV1 = create_model("Thing", id=(int, ...))
+ThingV2 = create_model("Thing", id=(str, ...))
+
+
+class Box(BaseModel):
+    thing: ThingV2  # type: ignore[valid-type]
+
+
+def create_app():
+    app = FastAPI(title="Shared components test API")
+
+    @version(1, 2)
+    @app.get("/items")
+    async def get_items() -> List[Item]:
+        return []
+
+    @version(1)
+    @app.get("/things")
+    async def get_things() -> ThingV1:  # type: ignore[valid-type]
+        return ThingV1(id=1)
+
+    @version(2)
+    @app.get("/things")
+    async def get_things_v2() -> Box:
+        return Box(thing=ThingV2(id="1"))
+
+    versioner = FastApiVersioner(app, shared_components=True)
+    versioner.version_fastapi()
+    return app, versioner
+
+
+def resolve_shared_refs(definition, schemas):
+    """Inlines the shared schemas into a definition referencing them."""
+    text = json.dumps(definition)
+    definition = json.loads(text.replace(SHARED_REF, "#/components/schemas/"))
+    used_schemas = definition.setdefault("components", {}).setdefault("schemas", {})
+    names = {n for n in schemas if SHARED_REF + n in text}
+    while names:
+        used_schemas.update({n: schemas[n] for n in names})
+        names = get_schema_refs([schemas[n] for n in names]) - used_schemas.keys()
+    return definition
+
+
+def test_shared_components():
+    app, versioner = create_app()
+    test_client = TestClient(app)
+
+    v1 = test_client.get("/v1/openapi.json").json()
+    v2 = test_client.get("/v2/openapi.json").json()
+    response = test_client.get("/openapi-components.json")
+    assert response.status_code == 200
+    components = response.json()
+    assert components["info"]["title"] == "Shared components test API"
+    assert components["paths"] == {}
+
+    schemas = components["components"]["schemas"]
+    # Thing differs between the versions and Box references it
+    assert set(schemas) == {"Item", "Tag"}
+    assert set(v1["components"]["schemas"]) == {"Thing"}
+    assert set(v2["components"]["schemas"]) == {"Box", "Thing"}
+    assert v1["paths"]["/v1/items"]["get"]["responses"]["200"]["content"][
+        "application/json"
+    ]["schema"]["items"] == {"$ref": SHARED_REF + "Item"}
+
+    # Resolving the shared references results in the complete definitions
+    assert resolve_shared_refs(v1, schemas) == versioner.openapi(1)
+    assert resolve_shared_refs(v2, schemas) == versioner.openapi(2)
+
+    versioner.invalidate_openapi(1)
+    assert versioner._openapi_cache == {}
+    assert test_client.get("/openapi-components.json").json() == components
+
+
+def test_share_components_stores_equal_schemas_once():
+    schema = {"type": "object", "properties": {"id": {"type": "integer"}}}
+    definitions = {
+        v: {
+            "paths": {},
+            "components": {"schemas": {"Item": json.loads(json.dumps(schema))}},
+        }
+        for v in ("1", "2")
+    }
+    shared_definitions, schemas = share_components(
+        definitions, {"1": "c.json", "2": "c.json"}
+    )
+    assert schemas == {"Item": schema}
+    assert shared_definitions == {"1": {"paths": {}}, "2": {"paths": {}}}
+    assert schemas["Item"] is definitions["1"]["components"]["schemas"]["Item"]
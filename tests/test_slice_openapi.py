@@ -0,0 +1,129 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from versioned_fastapi import FastApiVersioner, version
+
+security = HTTPBasic()
+
+
+class Tag(BaseModel):
+    name: str
+
+
+class Item(BaseModel):
+    id: int
+    tags: List[Tag]
+
+
+class ItemV2(Item):
+    description: str
+
+
+class User(BaseModel):
+    name: str
+
+
+def create_app(slice_openapi: bool, dispatch: str = "routes"):
+    app = FastAPI(
+        title="Slice test API",
+        openapi_tags=[{"name": "Items"}, {"name": "Users"}],
+    )
+
+    @version(1, 2)
+    @app.get("/items/{item_id}", tags=["Items"])
+    async def get_item(item_id: int) -> Item:
+        return Item(id=item_id, tags=[])
+
+    @version(1, 2, 3, downgrade={1: Tag})
+    @app.get("/tags/{name}", tags=["Items"])
+    async def get_tag(name: str) -> Tag:
+        return Tag(name=name)
+
+    @version(2)
+    @app.get("/items/{item_id}/details", tags=["Items"])
+    async def get_item_details(item_id: int) -> ItemV2:
+        return ItemV2(id=item_id, tags=[], description="")
+
+    @version(3)
+    @app.get("/users/me", tags=["Users"])
+    async def get_user(
+        credentials: HTTPBasicCredentials = Depends(security),
+    ) -> User:
+        return User(name=credentials.username)
+
+    admin_app = FastAPI()
+
+    @version(2, 3)
+    @admin_app.get("/users", tags=["Users"])
+    async def get_users() -> List[User]:
+        return []
+
+    app.mount("/admin", admin_app)
+
+    versioner = FastApiVersioner(
+        app,
+        slice_openapi=slice_openapi,
+        filter_tags=True,
+        dispatch=dispatch,
+        include_mounts=True,
+    )
+    versioner.version_fastapi()
+    return app, versioner
+
+
+@pytest.mark.parametrize("dispatch", ["routes", "prefix"])
+def test_sliced_openapi_equals_generated_openapi(dispatch):
+    generated_app, _ = create_app(slice_openapi=False, dispatch=dispatch)
+    sliced_app, sliced_versioner = create_app(slice_openapi=True, dispatch=dispatch)
+    generated_client = TestClient(generated_app)
+    sliced_client = TestClient(sliced_app)
+
+    for v in (1, 2, 3):
+        generated = generated_client.get(f"/v{v}/openapi.json")
+        sliced = sliced_client.get(f"/v{v}/openapi.json")
+        assert sliced.json() == generated.json()
+        assert sliced.content == generated.content
+
+    assert sliced_versioner._openapi_source is not None
+    assert "User" not in sliced_client.get("/v1/openapi.json").json()["components"]
+    assert "components" in sliced_client.get("/v3/openapi.json").json()
+
+
+def test_sliced_openapi_source_is_generated_once():
+    app, versioner = create_app(slice_openapi=True)
+    test_client = TestClient(app)
+
+    test_client.get("/v1/openapi.json")
+    source = versioner._openapi_source
+    # Each route is generated once, the converted route of version 1 separately
+    assert len(source["paths"]) == 6
+    test_client.get("/v2/openapi.json")
+    assert versioner._openapi_source is source
+
+    versioner.invalidate_openapi(1)
+    assert versioner._openapi_source is None
+
+
+def test_sliced_openapi_source_is_generated_once_concurrently():
+    _, versioner = create_app(slice_openapi=True)
+    create_openapi_source = versioner._create_openapi_source
+    calls = []
+
+    def create_source():
+        calls.append(1)
+        time.sleep(0.01)
+        return create_openapi_source()
+
+    versioner._create_openapi_source = create_source  # type: ignore[method-assign]
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        definitions = list(executor.map(versioner.openapi, [1, 2, 3] * 2))
+
+    assert len(calls) == 1
+    assert definitions[:3] == definitions[3:]
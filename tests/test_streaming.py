@@ -0,0 +1,98 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.responses import (
+    CachedContent,
+    ChunkedContent,
+    iter_json_chunks,
+    serialize_json,
+)
+
+
+def create_app():
+    app = FastAPI(title="Streaming test API")
+
+    for i in range(50):
+
+        @version(1, 2)
+        @app.get(f"/items{i}/{{item_id}}", description="x" * 100)
+        async def get_item(item_id: int) -> dict:
+            return {"id": item_id}
+
+    versioner = FastApiVersioner(app, stream_openapi=True)
+    versioner.openapi_chunk_size = 1024
+    versioner.version_fastapi()
+    return app, versioner
+
+
+@pytest.mark.parametrize(
+    "content",
+    [{}, [], {"a": {}, "b": {"c": [1, "ä"], "d": {"e": {"f": None}}}}, "text"],
+)
+def test_iter_json_chunks(content):
+    assert b"".join(iter_json_chunks(content)) == serialize_json(content)
+    assert b"".join(iter_json_chunks(content, depth=0)) == serialize_json(content)
+
+
+def test_chunked_content():
+    body = serialize_json({str(i): "x" * i for i in range(200)})
+    content = ChunkedContent(
+        iter_json_chunks(json.loads(body)), "application/json", 500, chunk_size=100
+    )
+    cached_content = CachedContent(body, "application/json", 500)
+
+    assert len(content.chunks) > 1
+    assert all(len(c) >= 100 for c in content.chunks[:-1])
+    assert content.body == body
+    assert content.etag == cached_content.etag
+    assert content.encoded_bodies.keys() == cached_content.encoded_bodies.keys()
+    assert gzip.decompress(content.encoded_bodies["gzip"]) == body
+
+    small_content = ChunkedContent([b"{}"], "application/json", 500)
+    assert small_content.encoded_chunks == {}
+
+
+def test_streamed_openapi():
+    app, versioner = create_app()
+    test_client = TestClient(app)
+
+    response = test_client.get(
+        "/v1/openapi.json", headers={"Accept-Encoding": "identity"}
+    )
+    assert response.status_code == 200
+    assert response.json() == versioner.openapi(1)
+    assert response.content == serialize_json(versioner.openapi(1))
+    assert response.headers["content-length"] == str(len(response.content))
+    content = versioner._openapi_cache["1"]
+    assert isinstance(content, ChunkedContent) and len(content.chunks) > 1
+
+    gzip_response = test_client.get(
+        "/v1/openapi.json", headers={"Accept-Encoding": "gzip"}
+    )
+    assert gzip_response.headers["content-encoding"] == "gzip"
+    assert gzip_response.content == response.content
+
+    response = test_client.get(
+        "/v1/openapi.json",
+        headers={
+            "Accept-Encoding": "identity",
+            "If-None-Match": response.headers["etag"],
+        },
+    )
+    assert response.status_code == 304
+
+
+def test_export_streamed_openapi(tmp_path):
+    app, versioner = create_app()
+    versioner.export(tmp_path)
+
+    path = tmp_path / "v2" / "openapi.json"
+    assert json.loads(path.read_bytes()) == versioner.openapi(2)
+    assert gzip.decompress((tmp_path / "v2" / "openapi.json.gz").read_bytes()) == (
+        path.read_bytes()
+    )
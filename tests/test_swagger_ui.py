@@ -0,0 +1,105 @@
+import re
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+
+
+def create_app(swagger_ui_dir=None, max_docs_root_paths=8):
+    app = FastAPI(title="Swagger UI test API")
+
+    @version(1, 2)
+    @app.get("/items")
+    async def get_items() -> list:
+        return []
+
+    versioner = FastApiVersioner(app)
+    versioner.swagger_ui_dir = swagger_ui_dir
+    versioner.max_docs_root_paths = max_docs_root_paths
+    versioner.version_fastapi()
+    return app, versioner
+
+
+@pytest.fixture
+def swagger_ui_dir(tmp_path):
+    (tmp_path / "swagger-ui-bundle.js").write_text("var bundle = 1;" * 100)
+    (tmp_path / "swagger-ui-standalone-preset.js").write_text("var preset = 1;")
+    (tmp_path / "swagger-ui.css").write_text("body {}")
+    (tmp_path / "favicon-32x32.png").write_bytes(b"\x89PNG")
+    return tmp_path
+
+
+def test_self_hosted_swagger_ui(swagger_ui_dir):
+    app, versioner = create_app(swagger_ui_dir)
+    # The files are compressed on their first request, not on startup
+    assert versioner._swagger_ui_assets == {}
+    main_app = FastAPI()
+    main_app.mount("/api", app)
+    test_client = TestClient(main_app)
+
+    docs = test_client.get("/api/docs").text
+    assert "cdn.jsdelivr.net" not in docs
+    urls = re.findall(r'(?:src|href)="(/api/swagger-ui/[0-9a-f]{16}/[^"]+)"', docs)
+    assert [url.rsplit("/", 1)[1] for url in urls] == [
+        "swagger-ui.css",
+        "favicon-32x32.png",
+        "swagger-ui-bundle.js",
+        "swagger-ui-standalone-preset.js",
+    ]
+
+    for url in urls:
+        response = test_client.get(url)
+        assert url.rsplit("/", 1)[1] in versioner._swagger_ui_assets
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == (
+            "public, max-age=31536000, immutable"
+        )
+    bundle_url = urls[2]
+    response = test_client.get(bundle_url)
+    assert response.headers["content-encoding"] in ("br", "gzip")
+    assert "javascript" in response.headers["content-type"]
+    assert response.text == (swagger_ui_dir / "swagger-ui-bundle.js").read_text()
+    assert test_client.get(urls[1]).headers["content-type"] == "image/png"
+    assert test_client.get(bundle_url.rsplit("/", 1)[0] + "/x.js").status_code == 404
+
+
+def test_self_hosted_swagger_ui_export(swagger_ui_dir, tmp_path_factory):
+    _, versioner = create_app(swagger_ui_dir)
+    out = tmp_path_factory.mktemp("out")
+    versioner.export(out)
+    assert len(list(out.glob("swagger-ui/*/swagger-ui.css"))) == 1
+
+
+def test_swagger_ui_bundle():
+    swagger_ui_bundle = pytest.importorskip("swagger_ui_bundle")
+    app, _ = create_app(swagger_ui_bundle.swagger_ui_path)
+    test_client = TestClient(app)
+
+    docs = test_client.get("/docs").text
+    for url in re.findall(r'(?:src|href)="(/swagger-ui/[^"]+)"', docs):
+        assert test_client.get(url).status_code == 200
+
+
+def test_docs_cached_per_root_path():
+    app, versioner = create_app(max_docs_root_paths=1)
+    rendered_root_paths = []
+    get_swagger_ui_html = versioner._get_swagger_ui_html
+
+    def count_rendered_root_paths(versions, root_path):
+        rendered_root_paths.append(root_path)
+        return get_swagger_ui_html(versions, root_path)
+
+    versioner._get_swagger_ui_html = count_rendered_root_paths  # type: ignore
+    main_app = FastAPI()
+    main_app.mount("/a", app)
+    main_app.mount("/b", app)
+    test_client = TestClient(main_app)
+
+    docs = test_client.get("/a/docs").text
+    assert "/a/v1/openapi.json" in docs
+    assert test_client.get("/a/docs").text == docs
+    assert "/b/v1/openapi.json" in test_client.get("/b/docs").text
+    assert test_client.get("/a/docs").text == docs
+    assert rendered_root_paths == ["/a", "/b", "/a"]
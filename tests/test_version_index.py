@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.index import VersionEntry, VersionIndex
+
+
+def create_app():
+    app = FastAPI()
+
+    @version(2, 1)
+    @app.get("/items")
+    async def get_items():
+        return []
+
+    @version(2)
+    @app.post("/items")
+    async def create_item():
+        return {}
+
+    @version(None)
+    @app.get("/health")
+    async def health():
+        return {}
+
+    return app
+
+
+def test_version_index():
+    app = create_app()
+    versioner = FastApiVersioner(app)
+    versioner.version_fastapi()
+    index = versioner.version_index
+    get_items, create_item = index.get_routes("2")
+
+    assert index.versions == ["2", "1"]
+    assert index.has_version("1") and not index.has_version("3")
+    assert index.get_routes("1") == [get_items]
+    assert index.get_routes("3") == []
+    assert index.get_versions(get_items) == ["2", "1"]
+    assert get_items in index
+    assert len(index) == 3
+    assert all(isinstance(e, VersionEntry) for e in index)
+    assert [e.path for e in index.get_entries("2")] == ["/items", "/items"]
+    assert not hasattr(index.get_entries("1")[0], "__dict__")
+    assert "/health" in [getattr(r, "path", None) for r in app.routes]
+
+
+def test_version_index_interns_versions():
+    app = FastAPI()
+
+    @app.get("/items")
+    async def get_items():
+        return []
+
+    route = app.routes[-1]
+    index = VersionIndex()
+    index.add(route, ["".join(["1", "0"])], "/admin")
+    other_index = VersionIndex()
+    other_index.add(route, ["".join(["1", "0"])])
+    index.update(other_index)
+
+    first, second = index.get_entries("10")
+    assert first.version is second.version
+    assert first.path == "/admin/items"
+    assert index.mount_paths == {"/admin"}
+    assert index.get_mount_path(route) == "/admin"
+    assert index.route_ids == {id(route)}
@@ -0,0 +1,128 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from versioned_fastapi import FastApiVersioner, version
+from versioned_fastapi.versions import (
+    VersionRange,
+    VersionSet,
+    get_version_key,
+    parse_version,
+)
+
+
+def test_version_key():
+    assert sorted(["10", "2", "1"], key=get_version_key) == ["1", "2", "10"]
+    assert sorted(["1.10.0", "1.2.0", "1.2"], key=get_version_key) == [
+        "1.2",
+        "1.2.0",
+        "1.10.0",
+    ]
+    assert sorted(["2024-02-01", "2024-01-31"], key=get_version_key) == [
+        "2024-01-31",
+        "2024-02-01",
+    ]
+    assert sorted(["beta", "2", "alpha"], key=get_version_key) == [
+        "2",
+        "alpha",
+        "beta",
+    ]
+
+
+def test_version_set_expand():
+    version_set = VersionSet(["1", "2", "3", "4", "5", "10", "3"])
+    assert version_set.versions == ["1", "2", "3", "4", "5", "10"]
+    assert version_set.expand(VersionRange.parse(">=2,<5")) == ["2", "3", "4"]
+    assert version_set.expand(VersionRange.parse("> 3")) == ["4", "5", "10"]
+    assert version_set.expand(VersionRange.parse("<=2")) == ["1", "2"]
+    assert version_set.expand(VersionRange.parse("==10")) == ["10"]
+    assert version_set.expand(VersionRange.parse(">=6,<10")) == []
+    assert parse_version(3) == "3"
+    assert repr(parse_version(">=2, <5")) == 'VersionRange(">=2,<5")'
+
+
+@pytest.mark.parametrize("spec", [">=", "2", ">=2,", "=>2"])
+def test_invalid_version_range(spec):
+    with pytest.raises(ValueError):
+        VersionRange.parse(spec)
+
+
+def create_app(**kwargs):
+    app = FastAPI()
+
+    @version(since=2)
+    @app.get("/items")
+    async def get_items():
+        return "since 2"
+
+    @version(">=1,<3", 10)
+    @app.get("/users")
+    async def get_users():
+        return "users"
+
+    @version(1, since=4, until=5)
+    @app.get("/orders")
+    async def get_orders():
+        return "orders"
+
+    @version(1, 2, 3, 10)
+    @app.get("/health")
+    async def health():
+        return "ok"
+
+    versioner = FastApiVersioner(app, **kwargs)
+    return app, versioner
+
+
+@pytest.mark.parametrize("dispatch", ["routes", "prefix"])
+def test_version_ranges(dispatch):
+    app, versioner = create_app(dispatch=dispatch, known_versions=[4, 5])
+    assert versioner.version_fastapi() == ["1", "2", "3", "4", "5", "10"]
+    index = versioner.version_index
+    assert [r.path for r in index.get_routes("1")] == ["/users", "/orders", "/health"]
+    assert [r.path for r in index.get_routes("4")] == ["/items", "/orders"]
+    assert [r.path for r in index.get_routes("10")] == ["/items", "/users", "/health"]
+
+    test_client = TestClient(app)
+    assert test_client.get("/v10/items").json() == "since 2"
+    assert test_client.get("/v1/items").status_code == 404
+    assert test_client.get("/v5/orders").json() == "orders"
+    assert test_client.get("/v3/orders").status_code == 404
+    assert test_client.get("/items").status_code == 404
+    docs = test_client.get("/docs").text
+    assert docs.index("/v2/openapi.json") < docs.index("/v10/openapi.json")
+
+
+def test_version_ranges_of_later_versions():
+    app, versioner = create_app()
+    versioner.version_fastapi()
+
+    @version(11)
+    @app.get("/new")
+    async def new():
+        return "new"
+
+    assert versioner.version_fastapi()[-1] == "11"
+    assert [r.path for r in versioner.version_index.get_routes("11")] == [
+        "/items",
+        "/new",
+    ]
+    assert TestClient(app).get("/v11/items").json() == "since 2"
+
+
+def test_version_range_without_known_versions():
+    app = FastAPI()
+
+    @version(1)
+    @app.get("/items")
+    async def get_items():
+        return []
+
+    @version(">=5")
+    @app.get("/users")
+    async def get_users():
+        return []
+
+    with pytest.raises(ValueError, match="get_users"):
+        FastApiVersioner(app).version_fastapi()
+    assert FastApiVersioner(app, known_versions=[5]).version_fastapi() == ["1", "5"]
@@ -0,0 +1,65 @@
+"""
+Command line interface of versioned_fastapi.
+
+Export the openapi definitions and swagger docs of all versions of an app, e.g.:
+
+    python -m versioned_fastapi export examples.simple:app --out dist/
+"""
+
+import argparse
+import importlib
+import sys
+from typing import List, Union
+
+from fastapi import FastAPI
+
+from .version_fastapi import FastApiVersioner
+
+
+def import_versioner(import_string: str) -> FastApiVersioner:
+    """
+    Imports a versioner or the app of a versioner from a string like "module:attribute".
+    Apps without versioner will be versioned with the default settings.
+    """
+    module_name, _, attribute = import_string.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(
+            f'Import string "{import_string}" must be in format "module:attribute".'
+        )
+    instance: Union[FastApiVersioner, FastAPI] = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        instance = getattr(instance, name)
+    if isinstance(instance, FastApiVersioner):
+        return instance
+    versioner = getattr(instance.state, "versioner", None)
+    if versioner is None:
+        versioner = FastApiVersioner(instance)
+        versioner.version_fastapi()
+    return versioner
+
+
+def main(args: List[str]) -> None:
+    parser = argparse.ArgumentParser(prog="python -m versioned_fastapi")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser(
+        "export",
+        help="Write the openapi definitions and swagger docs of all versions.",
+    )
+    export_parser.add_argument(
+        "app", help='The app or its versioner, e.g. "module:app".'
+    )
+    export_parser.add_argument("--out", default="dist", help="The output directory.")
+    export_parser.add_argument(
+        "--root-path", default="", help="The root path the app is served at."
+    )
+    parsed = parser.parse_args(args)
+
+    # Like uvicorn, import the app relative to the current directory
+    sys.path.insert(0, ".")
+    versioner = import_versioner(parsed.app)
+    for path in versioner.export(parsed.out, root_path=parsed.root_path):
+        print(path)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Sequence, Union
+
+from .responses import ENCODING_SUFFIXES, CachedContent, ChunkedContent
+
+
+class FileCache:
+    """
+    Stores serialized content in files, which are shared by multiple processes, e.g. the workers of a server.
+
+    The content is created by the first process requesting it, while the other processes wait for the file to be
+    written. Files are written atomically and never modified, as the keys are expected to be hashes of the content's
+    inputs. The files are mapped read-only into memory, so all processes share the same memory pages.
+    """
+
+    lock_timeout: float = 60.0
+    """The number of seconds after which the lock of a process creating the content is stale, e.g. if it was killed."""
+    poll_interval: float = 0.05
+    """The number of seconds to wait between checking whether another process created the content."""
+    chunk_size: int = 65536
+    """The size in bytes of the chunks, which are sent from the mapped files."""
+
+    def __init__(self, directory: Union[str, "os.PathLike[str]"]):
+        """
+        :param directory:
+            The directory to store the files in, it will be created if missing. Use a RAM backed directory like
+            "/dev/shm/..." to avoid disk IO.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(
+        self, key: str, media_type: str, create: Callable[[], CachedContent]
+    ) -> CachedContent:
+        """
+        Maps the content of a key or creates and stores it, if it does not exist yet.
+
+        :param key:
+            The key of the content, must be usable as file name.
+        :param media_type:
+            The media type of the content.
+        :param create:
+            Creates the content, if no process created it yet.
+        """
+        path = self.directory / key
+        lock_path = self.directory / f"{key}.lock"
+        while not path.is_file():
+            try:
+                lock = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                # Another process is creating the content
+                if self._is_stale(lock_path):
+                    lock_path.unlink(missing_ok=True)
+                else:
+                    time.sleep(self.poll_interval)
+                continue
+
+            try:
+                if not path.is_file():
+                    self._write(path, create())
+            finally:
+                os.close(lock)
+                # Another process might have removed the lock as stale
+                lock_path.unlink(missing_ok=True)
+        return self._map(path, media_type)
+
+    def _is_stale(self, lock_path: Path) -> bool:
+        """Returns True, if the lock is older than lock_timeout."""
+        try:
+            return time.time() - lock_path.stat().st_mtime > self.lock_timeout
+        except FileNotFoundError:
+            return False
+
+    def _map(self, path: Path, media_type: str) -> ChunkedContent:
+        """Maps the content, so the processes share its memory pages instead of copying it."""
+        return ChunkedContent.map(path, media_type, chunk_size=self.chunk_size)
+
+    @staticmethod
+    def _write(path: Path, content: CachedContent):
+        """Writes the content atomically, the uncompressed body last, as its existence marks the content complete."""
+        files: Dict[Path, Sequence[Union[bytes, memoryview]]] = {}
+        if isinstance(content, ChunkedContent):
+            for encoding, chunks in content.encoded_chunks.items():
+                files[path.with_name(path.name + ENCODING_SUFFIXES[encoding])] = chunks
+            files[path] = content.chunks
+        else:
+            for encoding, body in content.encoded_bodies.items():
+                files[path.with_name(path.name + ENCODING_SUFFIXES[encoding])] = [body]
+            files[path] = [content.body]
+        for file_path, chunks in files.items():
+            # Each thread needs its own file, as a lock might be taken over while the content is still written
+            temporary_path = file_path.with_name(
+                f"{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            )
+            with temporary_path.open("wb") as file:
+                file.writelines(chunks)
+            os.replace(temporary_path, file_path)
@@ -0,0 +1,261 @@
+import asyncio
+import collections.abc
+import inspect
+import types
+import typing
+from typing import Any, Callable, Dict, List, Tuple, Type, Union
+
+from fastapi.dependencies.utils import get_typed_signature
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+Converter = Union[Type[BaseModel], Callable[[Any], Any]]
+"""A model to map the fields to by name or a function converting a value, whose annotations define the models."""
+
+
+def get_model_fields(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """Gets the field names of a pydantic model."""
+    # model_fields is available since pydantic 2.0
+    fields = getattr(model, "model_fields", None)
+    return tuple(fields if fields is not None else model.__fields__)
+
+
+def get_required_fields(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """Gets the names of the fields of a pydantic model without default value."""
+    # model_fields is available since pydantic 2.0
+    fields = getattr(model, "model_fields", None)
+    if fields is not None:
+        return tuple(n for n, f in fields.items() if f.is_required())
+    return tuple(n for n, f in model.__fields__.items() if f.required)
+
+
+def compile_field_mapping(model: Type[BaseModel]) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Compiles a function mapping an object or a dict to a dict of the model's fields. Fields missing in the source are
+    omitted, fields not in the model are dropped.
+    """
+    names = get_model_fields(model)
+
+    def map_fields(value: Any) -> Dict[str, Any]:
+        if isinstance(value, dict):
+            return {n: value[n] for n in names if n in value}
+        return {n: getattr(value, n) for n in names if hasattr(value, n)}
+
+    return map_fields
+
+
+def is_model(value: Any) -> bool:
+    """Returns True, if the value is a pydantic model class."""
+    return isinstance(value, type) and issubclass(value, BaseModel)
+
+
+def get_type_hints(function: Callable[..., Any]) -> Dict[str, Any]:
+    """Gets the resolved type annotations of a function."""
+    try:
+        return typing.get_type_hints(function)
+    except Exception:
+        return {}
+
+
+def is_sequence_type(annotation: Any) -> bool:
+    """Returns True, if the annotation is a list, tuple, set or sequence type, e.g. List[Item]."""
+    origin = typing.get_origin(annotation)
+    return isinstance(origin, type) and issubclass(
+        origin, (list, tuple, set, collections.abc.Sequence)
+    )
+
+
+def get_optional_type(annotation: Any) -> Any:
+    """Gets the type of an optional annotation, e.g. Item of Optional[Item], otherwise None."""
+    # X | None is a types.UnionType since Python 3.10
+    if typing.get_origin(annotation) not in (Union, getattr(types, "UnionType", Union)):
+        return None
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    return args[0] if len(args) == 1 else None
+
+
+def compile_response_converter(
+    converter: Converter, response_model: Any
+) -> Tuple[Callable[[Any], Any], Any]:
+    """
+    Compiles a function converting the responses of an endpoint to the model of an older version.
+
+    :param converter:
+        The model of the older version or a function converting a response, whose return annotation is the model.
+    :param response_model:
+        The response model of the route. If it is optional or a sequence, the model of the older version will be
+        optional or a sequence too. Other generic types like dicts require a function.
+    :return:
+        The function and the response model of the older version.
+    """
+    if not is_model(converter):
+        return converter, get_type_hints(converter).get("return")
+
+    optional_type = get_optional_type(response_model)
+    if optional_type is not None:
+        convert_value, model = compile_response_converter(converter, optional_type)
+
+        def convert_optional(value: Any) -> Any:
+            return None if value is None else convert_value(value)
+
+        return convert_optional, Union[model, None]
+
+    map_fields = compile_field_mapping(converter)  # type: ignore[arg-type]
+    if is_sequence_type(response_model):
+
+        def convert(value: Any) -> Any:
+            return [map_fields(v) for v in value]
+
+        return convert, List[converter]  # type: ignore[valid-type]
+    if typing.get_origin(response_model) is not None:
+        raise ValueError(
+            f"Cannot map the fields of {converter.__name__} to {response_model!r}, use a function instead."
+        )
+    return map_fields, converter
+
+
+def compile_request_converter(
+    converter: Converter, annotation: Any
+) -> Tuple[Callable[[Any], Any], Any]:
+    """
+    Compiles a function converting a request parameter of an older version to the annotation of the endpoint.
+
+    :param converter:
+        The model of the older version or a function converting the value, whose first parameter is annotated with the
+        model.
+    :param annotation:
+        The annotation of the endpoint's parameter, must be an optional or required pydantic model if the converter is
+        a model. Then all required fields of the annotation must be fields of the converter.
+    :return:
+        The function and the annotation of the parameter in the older version.
+    """
+    optional_type = get_optional_type(annotation)
+    if is_model(converter) and optional_type is not None:
+        upgrade, model = compile_request_converter(converter, optional_type)
+        return upgrade, Union[model, None]
+    if is_model(converter):
+        if not is_model(annotation):
+            raise ValueError(
+                f"Cannot map the fields of {converter.__name__} to {annotation!r}, use a function instead."
+            )
+        missing_fields = set(get_required_fields(annotation)) - set(
+            get_model_fields(converter)
+        )
+        if missing_fields:
+            raise ValueError(
+                f"{converter.__name__} lacks the required fields {sorted(missing_fields)} of {annotation.__name__}, "
+                "use a function instead."
+            )
+        map_fields = compile_field_mapping(annotation)
+        # parse_obj was renamed to model_validate in pydantic 2.0
+        validate = getattr(annotation, "model_validate", None) or annotation.parse_obj
+        return lambda value: validate(map_fields(value)), converter
+
+    parameters = list(inspect.signature(converter).parameters)
+    hints = get_type_hints(converter)
+    if not parameters or parameters[0] not in hints:
+        raise ValueError(
+            f"The first parameter of the request converter {converter!r} must be annotated with the model."
+        )
+    return converter, hints[parameters[0]]
+
+
+def create_converted_route(
+    route: APIRoute,
+    *,
+    request_converters: Dict[str, Converter],
+    response_converter: Union[Converter, None],
+) -> APIRoute:
+    """
+    Creates a copy of the route for an older version, which converts the requests to the models of the endpoint and
+    its responses to the models of the older version. The converters are compiled once, so requests are only mapped
+    field by field. The request and response models of the copy are those of the older version, so they are shown in
+    its openapi definition.
+
+    :param route:
+        The route to copy.
+    :param request_converters:
+        The converters of the endpoint's parameters by name.
+    :param response_converter:
+        The converter of the endpoint's responses or None to keep them.
+    """
+    endpoint = route.endpoint
+    signature = get_typed_signature(endpoint)
+    unknown_parameters = request_converters.keys() - signature.parameters.keys()
+    if unknown_parameters:
+        raise ValueError(
+            f"The endpoint {route.name} has no parameters {sorted(unknown_parameters)}."
+        )
+
+    upgrades: List[Tuple[str, Callable[[Any], Any]]] = []
+    parameters = []
+    for parameter in signature.parameters.values():
+        converter = request_converters.get(parameter.name)
+        if converter is not None:
+            upgrade, annotation = compile_request_converter(
+                converter, parameter.annotation
+            )
+            upgrades.append((parameter.name, upgrade))
+            parameter = parameter.replace(annotation=annotation)
+        parameters.append(parameter)
+
+    response_model = route.response_model
+    downgrade = None
+    if response_converter is not None:
+        downgrade, response_model = compile_response_converter(
+            response_converter, response_model
+        )
+    is_coroutine = asyncio.iscoroutinefunction(endpoint)
+
+    async def converted_endpoint(**kwargs: Any) -> Any:
+        for name, upgrade in upgrades:
+            # Optional parameters, which were not sent, are not converted
+            if kwargs[name] is not None:
+                kwargs[name] = upgrade(kwargs[name])
+        if is_coroutine:
+            response = await endpoint(**kwargs)
+        else:
+            response = await run_in_threadpool(endpoint, **kwargs)
+        if downgrade is None or isinstance(response, Response):
+            return response
+        return downgrade(response)
+
+    converted_endpoint.__signature__ = signature.replace(  # type: ignore[attr-defined]
+        parameters=parameters, return_annotation=inspect.Signature.empty
+    )
+    # The copy is identified like the endpoint, e.g. by versioner.diff
+    converted_endpoint.__name__ = getattr(endpoint, "__name__", route.name)
+    converted_endpoint.__qualname__ = getattr(endpoint, "__qualname__", route.name)
+    converted_endpoint.__module__ = endpoint.__module__
+    converted_endpoint.__doc__ = endpoint.__doc__
+
+    return APIRoute(
+        route.path,
+        converted_endpoint,
+        response_model=response_model,
+        status_code=route.status_code,
+        tags=route.tags,
+        dependencies=route.dependencies,
+        summary=route.summary,
+        description=route.description,
+        response_description=route.response_description,
+        responses=route.responses,
+        deprecated=route.deprecated,
+        name=route.name,
+        methods=route.methods,
+        operation_id=route.operation_id,
+        response_model_include=route.response_model_include,
+        response_model_exclude=route.response_model_exclude,
+        response_model_by_alias=route.response_model_by_alias,
+        response_model_exclude_unset=route.response_model_exclude_unset,
+        response_model_exclude_defaults=route.response_model_exclude_defaults,
+        response_model_exclude_none=route.response_model_exclude_none,
+        include_in_schema=route.include_in_schema,
+        response_class=route.response_class,
+        dependency_overrides_provider=route.dependency_overrides_provider,
+        callbacks=route.callbacks,
+        openapi_extra=route.openapi_extra,
+        generate_unique_id_function=route.generate_unique_id_function,
+    )
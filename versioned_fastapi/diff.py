@@ -0,0 +1,204 @@
+import enum
+import hashlib
+import json
+import typing
+from typing import Any, Dict, List, Tuple, Type, Union
+
+from fastapi.dependencies.utils import get_flat_dependant
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+RouteKey = Tuple[str, str]
+"""The path and method of a route."""
+
+
+def describe_type(annotation: Any, models: Dict[type, str]) -> Any:
+    """
+    Describes a type annotation by the names of its types, without generating JSON schemas. Pydantic models are
+    described by a hash of their fields, enums by their values.
+
+    :param annotation:
+        The annotation, e.g. List[Item].
+    :param models:
+        The hashes of already described models by class, which is updated.
+    """
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return describe_model(annotation, models)
+        if issubclass(annotation, enum.Enum):
+            return [get_name(annotation), [m.value for m in annotation]]
+    args = typing.get_args(annotation)
+    if args:
+        return [
+            repr(typing.get_origin(annotation)),
+            [describe_type(a, models) for a in args],
+        ]
+    return get_name(annotation) if isinstance(annotation, type) else repr(annotation)
+
+
+def describe_model(model: Type[BaseModel], models: Dict[type, str]) -> str:
+    """Gets a hash of the name, the docstring, the config and the fields of a pydantic model, computed once per model."""
+    description = models.get(model)
+    if description is None:
+        # Recursive models refer to themselves by name
+        models[model] = get_name(model)
+        # model_fields is available since pydantic 2.0
+        fields = getattr(model, "model_fields", None)
+        if fields is not None:
+            config = repr(model.model_config)
+            field_descriptions = [
+                [n, repr(f), describe_type(f.annotation, models)]
+                for n, f in fields.items()
+            ]
+        else:
+            config = ""
+            field_descriptions = [
+                [
+                    n,
+                    f.alias,
+                    f.required,
+                    repr(f.field_info),
+                    describe_type(f.outer_type_, models),
+                ]
+                for n, f in model.__fields__.items()
+            ]
+        description = models[model] = hash_value(
+            [get_name(model), model.__doc__, config, field_descriptions]
+        )
+    return description
+
+
+def describe_field(field: Any, models: Dict[type, str], named: bool = True) -> Any:
+    """
+    Describes a request or response field of FastAPI by its annotation and field info.
+
+    :param field:
+        The field.
+    :param models:
+        The hashes of already described models by class, which is updated.
+    :param named:
+        Whether to include the alias of the field. FastAPI names response fields after the unique_id of the route,
+        which does not affect the responses.
+    """
+    # The fields of pydantic 1 have no mode, their outer_type_ is the annotation
+    annotation = getattr(field, "outer_type_", None) or field.field_info.annotation
+    return [
+        field.alias if named else None,
+        field.required,
+        getattr(field, "mode", None),
+        repr(field.field_info),
+        describe_type(annotation, models),
+    ]
+
+
+def get_name(value: Any) -> str:
+    """Gets the module and qualified name of a class or function."""
+    return f"{value.__module__}.{getattr(value, '__qualname__', repr(value))}"
+
+
+def get_route_signature(
+    route: APIRoute, models: Union[Dict[type, str], None] = None
+) -> Dict[str, str]:
+    """
+    Gets hashes of the endpoint, the request and the response of a route. Routes with equal hashes behave the same,
+    as long as the endpoints do not use global state. The models are described by their fields instead of JSON
+    schemas, so this is much cheaper than generating the route's openapi definition.
+
+    :param route:
+        The route.
+    :param models:
+        The hashes of already described models by class, which is updated. Share it between routes to describe each
+        model only once.
+    """
+    models = {} if models is None else models
+    dependant = get_flat_dependant(route.dependant)
+    request: List[Any] = [
+        [(param_type, describe_field(field, models)) for field in fields]
+        for param_type, fields in (
+            ("path", dependant.path_params),
+            ("query", dependant.query_params),
+            ("header", dependant.header_params),
+            ("cookie", dependant.cookie_params),
+        )
+    ]
+    request.append(
+        [
+            (
+                r.security_scheme.scheme_name,
+                repr(r.security_scheme.model),
+                sorted(r.scopes or []),
+            )
+            for r in dependant.security_requirements
+        ]
+    )
+    if route.body_field is not None:
+        # FastAPI wraps multiple or embedded body parameters in a model named after the unique_id of the route
+        if any(route.body_field is f for f in dependant.body_params):
+            request.append(["body", describe_field(route.body_field, models)])
+        else:
+            request.append(
+                [
+                    "embedded body",
+                    route.body_field.required,
+                    [describe_field(f, models) for f in dependant.body_params],
+                ]
+            )
+    response = [
+        route.status_code,
+        getattr(route.response_class, "__name__", repr(route.response_class)),
+        route.response_field and describe_field(route.response_field, models, False),
+        {
+            str(code): [
+                describe_type(r.get("model"), models),
+                repr({k: v for k, v in r.items() if k != "model"}),
+            ]
+            for code, r in route.responses.items()
+        },
+    ]
+    return {
+        "endpoint": get_name(route.endpoint),
+        "request": hash_value(request),
+        "response": hash_value(response),
+    }
+
+
+def hash_value(value: Any) -> str:
+    """Hashes a JSON serializable value."""
+    serialized = json.dumps(value, sort_keys=True, default=repr).encode("utf-8")
+    return hashlib.sha256(serialized).hexdigest()[:16]
+
+
+def diff_routes(
+    from_routes: Dict[RouteKey, Dict[str, str]],
+    to_routes: Dict[RouteKey, Dict[str, str]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Compares the routes of two versions.
+
+    :param from_routes:
+        The signatures of the routes of the older version by path and method.
+    :param to_routes:
+        The signatures of the routes of the newer version by path and method.
+    :return:
+        The added, removed and changed routes, sorted by path and method. Changed routes list which of the endpoint,
+        the request and the response changed.
+    """
+    changed = []
+    for key in sorted(from_routes.keys() & to_routes.keys()):
+        from_signature = from_routes[key]
+        to_signature = to_routes[key]
+        if changes := [
+            n for n in from_signature if from_signature[n] != to_signature[n]
+        ]:
+            changed.append({"path": key[0], "method": key[1], "changes": changes})
+    return {
+        "added": [
+            {"path": p, "method": m}
+            for p, m in sorted(to_routes.keys() - from_routes.keys())
+        ],
+        "removed": [
+            {"path": p, "method": m}
+            for p, m in sorted(from_routes.keys() - to_routes.keys())
+        ],
+        "changed": changed,
+    }
@@ -0,0 +1,114 @@
+import sys
+from typing import Dict, Iterable, Iterator, List, Set
+
+from fastapi.routing import APIRoute
+
+
+class VersionEntry:
+    """A route annotated with a version."""
+
+    __slots__ = ("version", "route", "mount_path")
+
+    def __init__(self, version: str, route: APIRoute, mount_path: str = ""):
+        """
+        :param version:
+            The version of the route.
+        :param route:
+            The annotated route without version prefix.
+        :param mount_path:
+            The path of the mounted app containing the route, if any.
+        """
+        self.version = version
+        self.route = route
+        self.mount_path = mount_path
+
+    @property
+    def path(self) -> str:
+        """The path of the route including the mount path, but without version prefix."""
+        return self.mount_path + self.route.path
+
+
+class VersionIndex:
+    """
+    The annotated routes by version, in the order they were added.
+
+    Routes are identified by their id, so lookups and removals never compare routes. The versions are interned, as
+    every route stores its version.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, List[VersionEntry]] = {}
+        self._entries_by_route: Dict[int, List[VersionEntry]] = {}
+
+    def add(self, route: APIRoute, versions: Iterable[str], mount_path: str = ""):
+        """
+        Adds a route to the index.
+
+        :param route:
+            The annotated route.
+        :param versions:
+            The versions of the route.
+        :param mount_path:
+            The path of the mounted app containing the route, if any.
+        """
+        for version in versions:
+            entry = VersionEntry(sys.intern(version), route, mount_path)
+            self._entries.setdefault(entry.version, []).append(entry)
+            self._entries_by_route.setdefault(id(route), []).append(entry)
+
+    def update(self, other: "VersionIndex"):
+        """Adds the entries of another index, e.g. of routes added later."""
+        for entries in other._entries.values():
+            for entry in entries:
+                self._entries.setdefault(entry.version, []).append(entry)
+                self._entries_by_route.setdefault(id(entry.route), []).append(entry)
+
+    @property
+    def versions(self) -> List[str]:
+        """The versions in the order of their first route."""
+        return list(self._entries)
+
+    @property
+    def route_ids(self) -> Set[int]:
+        """The ids of all indexed routes."""
+        return set(self._entries_by_route)
+
+    @property
+    def mount_paths(self) -> Set[str]:
+        """The mount paths of all indexed routes of mounted apps."""
+        return {
+            entries[0].mount_path
+            for entries in self._entries_by_route.values()
+            if entries and entries[0].mount_path
+        }
+
+    def has_version(self, version: str) -> bool:
+        """Returns True, if a route is annotated with the version."""
+        return version in self._entries
+
+    def get_entries(self, version: str) -> List[VersionEntry]:
+        """Gets the entries of a version."""
+        return self._entries.get(version, [])
+
+    def get_routes(self, version: str) -> List[APIRoute]:
+        """Gets the routes of a version as new list."""
+        return [e.route for e in self._entries.get(version, [])]
+
+    def get_versions(self, route: APIRoute) -> List[str]:
+        """Gets the versions of a route."""
+        return [e.version for e in self._entries_by_route.get(id(route), [])]
+
+    def get_mount_path(self, route: APIRoute) -> str:
+        """Gets the path of the mounted app containing a route, or an empty string."""
+        entries = self._entries_by_route.get(id(route))
+        return entries[0].mount_path if entries else ""
+
+    def __contains__(self, route: object) -> bool:
+        return id(route) in self._entries_by_route
+
+    def __iter__(self) -> Iterator[VersionEntry]:
+        for entries in self._entries.values():
+            yield from entries
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
@@ -0,0 +1,191 @@
+import bisect
+import time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+MetricsSink = Callable[[str, str, str, float], None]
+"""A function receiving the version, method, route path and duration in seconds of each sampled request."""
+MetricsKey = Tuple[str, str, str]
+"""The version, method and route path of requests."""
+
+
+class Histogram:
+    """The number of requests by duration bucket and the sum of their durations."""
+
+    __slots__ = ("bucket_counts", "sum")
+
+    def __init__(self, bucket_count: int):
+        """
+        :param bucket_count:
+            The number of buckets, including the bucket of durations greater than all bounds.
+        """
+        self.bucket_counts: List[int] = [0] * bucket_count
+        self.sum = 0.0
+
+
+class RequestMetrics:
+    """
+    Records the number and duration of requests per version, method and route path.
+
+    The histograms are updated without locks, as requests are usually handled by a single event loop thread. Requests
+    can be sampled to reduce the overhead, then every n-th request is recorded and counted n times.
+    """
+
+    buckets: Sequence[float] = (
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    )
+    """The upper bounds in seconds of the duration buckets, like the default buckets of the Prometheus clients."""
+    prometheus_name: str = "versioned_fastapi_request_duration_seconds"
+    """The name of the histogram in the Prometheus text format."""
+
+    def __init__(self, *, sample_rate: float = 1.0, sinks: Iterable[MetricsSink] = ()):
+        """
+        :param sample_rate:
+            The share of requests to record, between 0 (exclusive) and 1. E.g. with 0.1 every tenth request is recorded.
+        :param sinks:
+            Functions receiving each sampled request in addition to the histograms, e.g. opentelemetry_sink().
+        """
+        if not 0 < sample_rate <= 1:
+            raise ValueError("The sample rate must be greater than 0 and at most 1.")
+        self.sample_interval = round(1 / sample_rate)
+        self.sinks = list(sinks)
+        self.histograms: Dict[MetricsKey, Histogram] = {}
+        self._request_count = 0
+
+    def sample(self) -> bool:
+        """Returns True, if the current request should be recorded."""
+        if self.sample_interval == 1:
+            return True
+        self._request_count += 1
+        return self._request_count % self.sample_interval == 0
+
+    def record(self, version: str, method: str, route: str, duration: float):
+        """
+        Records a sampled request.
+
+        :param version:
+            The version of the route.
+        :param method:
+            The method of the request.
+        :param route:
+            The path of the route without version prefix, e.g. "/items/{item_id}".
+        :param duration:
+            The duration of the request in seconds.
+        """
+        key = (version, method, route)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms.setdefault(
+                key, Histogram(len(self.buckets) + 1)
+            )
+        histogram.bucket_counts[bisect.bisect_left(self.buckets, duration)] += (
+            self.sample_interval
+        )
+        histogram.sum += duration * self.sample_interval
+        for sink in self.sinks:
+            sink(version, method, route, duration)
+
+    def prometheus_text(self) -> str:
+        """Returns the histograms in the Prometheus text format."""
+        name = self.prometheus_name
+        lines = [
+            f"# HELP {name} Duration of requests per version and route.",
+            f"# TYPE {name} histogram",
+        ]
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for (version, method, route), histogram in sorted(self.histograms.items()):
+            labels = (
+                f'version="{escape_label(version)}",method="{escape_label(method)}",'
+                f'route="{escape_label(route)}"'
+            )
+            count = 0
+            for bound, bucket_count in zip(bounds, histogram.bucket_counts):
+                count += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value: str) -> str:
+    """Escapes a label value of the Prometheus text format."""
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def opentelemetry_sink(meter: Any = None) -> MetricsSink:
+    """
+    Creates a sink recording the requests in an OpenTelemetry histogram. Requires opentelemetry-api to be installed.
+
+    :param meter:
+        The meter to create the histogram with. If None, the meter "versioned_fastapi" of the global meter provider
+        will be used.
+    """
+    from opentelemetry import metrics
+
+    histogram = (meter or metrics.get_meter("versioned_fastapi")).create_histogram(
+        "versioned_fastapi.request.duration",
+        unit="s",
+        description="Duration of requests per version and route.",
+    )
+
+    def record(version: str, method: str, route: str, duration: float):
+        histogram.record(
+            duration,
+            {"version": version, "http.request.method": method, "http.route": route},
+        )
+
+    return record
+
+
+class MetricsMiddleware:
+    """ASGI middleware measuring the duration of requests to versioned routes."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        metrics: RequestMetrics,
+        get_version: Callable[[Scope], Union[Tuple[str, str], None]],
+    ):
+        """
+        :param app:
+            The ASGI app.
+        :param metrics:
+            The metrics to record the requests in.
+        :param get_version:
+            Gets the version and the route path without version prefix of a routed request, or None for requests to
+            routes without version.
+        """
+        self.app = app
+        self.metrics = metrics
+        self.get_version = get_version
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.metrics.sample():
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The router adds the matched route to the scope
+            version_and_route = self.get_version(scope)
+            if version_and_route is not None:
+                self.metrics.record(
+                    version_and_route[0],
+                    scope["method"],
+                    version_and_route[1],
+                    time.perf_counter() - start,
+                )
@@ -0,0 +1,179 @@
+import hashlib
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+REF_PREFIX = "#/components/schemas/"
+OPENAPI_KEYS = (
+    "openapi",
+    "info",
+    "jsonSchemaDialect",
+    "servers",
+    "paths",
+    "webhooks",
+    "components",
+    "security",
+    "tags",
+    "externalDocs",
+)
+"""The top level keys of an openapi definition in the order used by FastAPI."""
+
+
+def get_schema_refs(value: Any) -> Set[str]:
+    """Gets the names of all component schemas referenced via "$ref" in a (nested) openapi object."""
+    refs: Set[str] = set()
+    stack: List[Any] = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            ref = value.get("$ref")
+            if isinstance(ref, str) and ref.startswith(REF_PREFIX):
+                refs.add(ref[len(REF_PREFIX) :])
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return refs
+
+
+def slice_openapi(
+    source: Dict[str, Any], definition: Dict[str, Any], paths: Iterable[str]
+) -> Dict[str, Any]:
+    """
+    Completes an openapi definition with paths and components of an already generated openapi definition.
+
+    :param source:
+        The openapi definition containing the paths, e.g. the definition of all routes.
+    :param definition:
+        The openapi definition to complete, e.g. a definition generated without routes.
+    :param paths:
+        The paths to take from the source, components are taken if referenced by these paths.
+    :return:
+        The completed definition, which shares its paths and components with the source.
+    """
+    definition = dict(definition)
+    source_paths = source.get("paths", {})
+    definition["paths"] = {p: source_paths[p] for p in paths if p in source_paths}
+    if "webhooks" in source:
+        definition["webhooks"] = source["webhooks"]
+
+    source_components = source.get("components", {})
+    components: Dict[str, Any] = {}
+    source_schemas = source_components.get("schemas", {})
+    schema_names: Set[str] = set()
+    refs = get_schema_refs([definition["paths"], definition.get("webhooks")])
+    while refs:
+        schema_names.update(refs)
+        refs = get_schema_refs([source_schemas[r] for r in refs if r in source_schemas])
+        refs -= schema_names
+    if schemas := {
+        n: source_schemas[n] for n in sorted(schema_names) if n in source_schemas
+    }:
+        components["schemas"] = schemas
+
+    source_security_schemes = source_components.get("securitySchemes", {})
+    security_names = {
+        name
+        for path in [
+            *definition["paths"].values(),
+            *definition.get("webhooks", {}).values(),
+        ]
+        for operation in path.values()
+        for requirement in operation.get("security", [])
+        for name in requirement
+    }
+    if security_schemes := {
+        n: s for n, s in source_security_schemes.items() if n in security_names
+    }:
+        components["securitySchemes"] = security_schemes
+
+    if components:
+        definition["components"] = components
+    return {
+        **{k: definition[k] for k in OPENAPI_KEYS if k in definition},
+        **definition,
+    }
+
+
+def get_schema_hash(schema: Any) -> str:
+    """Gets a hash of the content of a schema, which is independent of the order of its keys."""
+    return hashlib.sha256(
+        json.dumps(schema, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+def replace_schema_refs(value: Any, refs: Dict[str, str]) -> Any:
+    """Copies a (nested) openapi object, replacing "$ref" values of component schemas contained in refs."""
+    if isinstance(value, dict):
+        ref = value.get("$ref")
+        if isinstance(ref, str) and ref.startswith(REF_PREFIX):
+            name = ref[len(REF_PREFIX) :]
+            if name in refs:
+                return {**value, "$ref": refs[name]}
+        return {k: replace_schema_refs(v, refs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [replace_schema_refs(v, refs) for v in value]
+    return value
+
+
+def share_components(
+    definitions: Dict[str, Dict[str, Any]], components_urls: Dict[str, str]
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Moves the component schemas, which are equal in all definitions using them, to a shared components object.
+
+    Schemas are indexed by a hash of their content, so equal schemas of different definitions are stored only once.
+    A schema is only shared, if all schemas referenced by it are shared as well.
+
+    :param definitions:
+        The openapi definitions by key, e.g. by version.
+    :param components_urls:
+        The url of the document containing the shared components by key, relative to the url of the definition.
+    :return:
+        The definitions referencing the shared schemas and the shared component schemas.
+    """
+    schemas_by_hash: Dict[str, Dict[str, Any]] = {}
+    hashes_by_name: Dict[str, Set[str]] = defaultdict(set)
+    for definition in definitions.values():
+        for name, schema in definition.get("components", {}).get("schemas", {}).items():
+            schema_hash = get_schema_hash(schema)
+            schemas_by_hash.setdefault(schema_hash, schema)
+            hashes_by_name[name].add(schema_hash)
+
+    shared_schemas = {
+        name: schemas_by_hash[next(iter(hashes))]
+        for name, hashes in sorted(hashes_by_name.items())
+        if len(hashes) == 1
+    }
+    # Shared schemas must not reference schemas, which are only defined in the definitions
+    while unshared := {
+        name
+        for name, schema in shared_schemas.items()
+        if not get_schema_refs(schema) <= shared_schemas.keys()
+    }:
+        for name in unshared:
+            del shared_schemas[name]
+
+    shared_definitions = {}
+    for key, definition in definitions.items():
+        schemas = definition.get("components", {}).get("schemas", {})
+        refs = {
+            name: f"{components_urls[key]}{REF_PREFIX}{name}"
+            for name in schemas
+            if name in shared_schemas
+        }
+        definition = replace_schema_refs(
+            {
+                **definition,
+                "components": {
+                    **definition.get("components", {}),
+                    "schemas": {n: s for n, s in schemas.items() if n not in refs},
+                },
+            },
+            refs,
+        )
+        if not definition["components"]["schemas"]:
+            del definition["components"]["schemas"]
+        if not definition["components"]:
+            del definition["components"]
+        shared_definitions[key] = definition
+    return shared_definitions, shared_schemas
@@ -0,0 +1,386 @@
+import gzip
+import hashlib
+import json
+import mmap
+import zlib
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Union
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+"""The file suffixes of the compressed variants, as used by nginx's gzip_static and brotli_static."""
+
+
+def serialize_json(content: Any) -> bytes:
+    """Serializes content to compact JSON like JSONResponse does, but faster using orjson if installed."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class CachedContent:
+    """Serialized response content, which is hashed and compressed once and can be sent as often as needed."""
+
+    __slots__ = ("body", "media_type", "etag", "encoded_bodies")
+
+    brotli_quality: int = 5
+    """The brotli quality from 0 to 11, higher qualities compress large content only slightly better but much slower."""
+
+    def __init__(
+        self, body: bytes, media_type: str, minimum_size: Union[int, None] = None
+    ):
+        """
+        :param body:
+            The serialized response body.
+        :param media_type:
+            The media type of the body.
+        :param minimum_size:
+            The minimum size in bytes of the body to store compressed variants.
+            Brotli will only be used if installed. Leave None to disable compression.
+        """
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.encoded_bodies: Dict[str, bytes] = {}
+        if minimum_size is not None and len(body) >= minimum_size:
+            if brotli is not None:
+                self.encoded_bodies["br"] = brotli.compress(
+                    body, quality=self.brotli_quality
+                )
+            self.encoded_bodies["gzip"] = gzip.compress(body, mtime=0)
+
+    @classmethod
+    def read(cls, path: Path, media_type: str) -> "CachedContent":
+        """
+        Reads content written by CachedContent.write, including its compressed variants.
+
+        :param path:
+            The path of the uncompressed body.
+        :param media_type:
+            The media type of the body.
+        """
+        content = cls(path.read_bytes(), media_type)
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            encoded_path = path.with_name(path.name + suffix)
+            if encoded_path.is_file():
+                content.encoded_bodies[encoding] = encoded_path.read_bytes()
+        return content
+
+    def write(self, path: Path):
+        """
+        Writes the body and its compressed variants, e.g. "openapi.json" and "openapi.json.gz".
+
+        :param path:
+            The path of the uncompressed body, missing parent directories will be created.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(self.body)
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            encoded_path = path.with_name(path.name + suffix)
+            if encoding in self.encoded_bodies:
+                encoded_path.write_bytes(self.encoded_bodies[encoding])
+            elif encoded_path.is_file():
+                encoded_path.unlink()
+
+    def response(
+        self, request: Request, cache_control: Union[str, None] = None
+    ) -> Response:
+        """
+        Creates a response for the request, which is empty if the client already has the content.
+
+        :param request:
+            The request to respond to, its If-None-Match and Accept-Encoding headers will be evaluated.
+        :param cache_control:
+            The value of the Cache-Control header, leave None to omit the header.
+        """
+        etag = self.etag
+        headers: Dict[str, str] = {}
+        encoding = None
+        encodings = self._get_encodings()
+        if encodings:
+            headers["Vary"] = "Accept-Encoding"
+            encoding = select_encoding(
+                request.headers.get("accept-encoding"), encodings
+            )
+            if encoding is not None:
+                # Each representation needs its own ETag
+                etag = f'{etag[:-1]}-{encoding}"'
+                headers["Content-Encoding"] = encoding
+        headers["ETag"] = etag
+        if cache_control:
+            headers["Cache-Control"] = cache_control
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        return self._create_response(encoding, headers)
+
+    def _get_encodings(self) -> List[str]:
+        """Gets the content codings of the compressed variants."""
+        return list(self.encoded_bodies)
+
+    def _create_response(
+        self, encoding: Union[str, None], headers: Dict[str, str]
+    ) -> Response:
+        """Creates the response sending the body in the content coding, or uncompressed if the encoding is None."""
+        body = self.body if encoding is None else self.encoded_bodies[encoding]
+        return Response(body, media_type=self.media_type, headers=headers)
+
+
+class ChunkedContent(CachedContent):
+    """
+    Serialized response content, which is stored in chunks and streamed to the clients.
+
+    The content is never joined into a single bytes object, so large content needs no second copy while it is encoded,
+    hashed and compressed, and each response only holds the chunk being sent. Content mapped from files shares its
+    memory pages with all processes mapping the same files.
+    """
+
+    __slots__ = ("chunks", "encoded_chunks")
+
+    def __init__(
+        self,
+        chunks: Iterable[bytes],
+        media_type: str,
+        minimum_size: Union[int, None] = None,
+        *,
+        chunk_size: int = 65536,
+    ):
+        """
+        :param chunks:
+            The serialized response body in parts of any size, e.g. created by iter_json_chunks.
+        :param media_type:
+            The media type of the body.
+        :param minimum_size:
+            The minimum size in bytes of the body to store compressed variants.
+            Brotli will only be used if installed. Leave None to disable compression.
+        :param chunk_size:
+            The minimum size in bytes of the stored chunks, smaller parts are joined.
+        """
+        self.media_type = media_type
+        self.chunks: List[Union[bytes, memoryview]] = []
+        compressors: Dict[str, Any] = {}
+        if minimum_size is not None:
+            if brotli is not None:
+                compressors["br"] = brotli.Compressor(quality=self.brotli_quality)
+            compressors["gzip"] = zlib.compressobj(9, zlib.DEFLATED, 31)
+        self.encoded_chunks: Dict[str, List[Union[bytes, memoryview]]] = {
+            e: [] for e in compressors
+        }
+        hash_ = hashlib.sha256()
+        size = 0
+        for chunk in join_chunks(chunks, chunk_size):
+            self.chunks.append(chunk)
+            hash_.update(chunk)
+            size += len(chunk)
+            for encoding, compressor in compressors.items():
+                if encoded_chunk := compress_chunk(compressor, chunk):
+                    self.encoded_chunks[encoding].append(encoded_chunk)
+        for encoding, compressor in compressors.items():
+            self.encoded_chunks[encoding].append(
+                compressor.finish() if encoding == "br" else compressor.flush()
+            )
+        if minimum_size is not None and size < minimum_size:
+            self.encoded_chunks = {}
+        self.etag = f'"{hash_.hexdigest()[:32]}"'
+
+    @classmethod
+    def map(
+        cls, path: Path, media_type: str, *, chunk_size: int = 65536
+    ) -> "ChunkedContent":
+        """
+        Maps content written by CachedContent.write read-only into memory, including its compressed variants. The
+        chunks are slices of the mapping, so the content is not copied into the memory of the process.
+
+        :param path:
+            The path of the uncompressed body.
+        :param media_type:
+            The media type of the body.
+        :param chunk_size:
+            The size in bytes of the chunks.
+        """
+        content = cls.__new__(cls)
+        content.media_type = media_type
+        content.chunks = map_chunks(path, chunk_size)
+        content.encoded_chunks = {}
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            encoded_path = path.with_name(path.name + suffix)
+            if encoded_path.is_file():
+                content.encoded_chunks[encoding] = map_chunks(encoded_path, chunk_size)
+        hash_ = hashlib.sha256()
+        for chunk in content.chunks:
+            hash_.update(chunk)
+        content.etag = f'"{hash_.hexdigest()[:32]}"'
+        return content
+
+    @property  # type: ignore[override]
+    def body(self) -> bytes:
+        """The joined body, only for callers which need a single bytes object."""
+        return b"".join(self.chunks)
+
+    @property  # type: ignore[override]
+    def encoded_bodies(self) -> Dict[str, bytes]:
+        """The joined compressed variants, only for callers which need single bytes objects."""
+        return {e: b"".join(c) for e, c in self.encoded_chunks.items()}
+
+    def write(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        variants = {"": self.chunks}
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            encoded_path = path.with_name(path.name + suffix)
+            if encoding in self.encoded_chunks:
+                variants[suffix] = self.encoded_chunks[encoding]
+            elif encoded_path.is_file():
+                encoded_path.unlink()
+        for suffix, chunks in variants.items():
+            with path.with_name(path.name + suffix).open("wb") as file:
+                file.writelines(chunks)
+
+    def _get_encodings(self) -> List[str]:
+        return list(self.encoded_chunks)
+
+    def _create_response(
+        self, encoding: Union[str, None], headers: Dict[str, str]
+    ) -> Response:
+        chunks = self.chunks if encoding is None else self.encoded_chunks[encoding]
+        headers["Content-Length"] = str(sum(len(c) for c in chunks))
+        return StreamingResponse(
+            iter_async(chunks), media_type=self.media_type, headers=headers
+        )
+
+
+def compress_chunk(compressor: Any, chunk: bytes) -> bytes:
+    """Compresses a chunk with a brotli or zlib compressor, the output might be empty until more data is added."""
+    if hasattr(compressor, "process"):
+        return compressor.process(chunk)
+    return compressor.compress(chunk)
+
+
+async def iter_async(
+    chunks: Iterable[Union[bytes, memoryview]],
+) -> AsyncIterator[bytes]:
+    """
+    Iterates chunks asynchronously, so StreamingResponse does not iterate them in the thread pool. Mapped chunks are
+    copied one at a time, as ASGI requires bytes.
+    """
+    for chunk in chunks:
+        yield chunk if isinstance(chunk, bytes) else bytes(chunk)
+
+
+def map_chunks(path: Path, chunk_size: int) -> List[Union[bytes, memoryview]]:
+    """Maps a file read-only into memory and slices the mapping into chunks."""
+    with path.open("rb") as file:
+        if not path.stat().st_size:
+            return []
+        # The mapping stays open as long as the chunks reference it
+        view = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    return [view[i : i + chunk_size] for i in range(0, len(view), chunk_size)]
+
+
+def join_chunks(chunks: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    """Joins small chunks to chunks of at least chunk_size bytes, except the last one."""
+    parts: List[bytes] = []
+    size = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def iter_json_chunks(
+    content: Any,
+    serializer: Union[Callable[[Any], bytes], None] = None,
+    depth: int = 3,
+) -> Iterator[bytes]:
+    """
+    Serializes content to compact JSON in parts, e.g. an openapi definition path by path and schema by schema.
+
+    :param content:
+        The content to serialize.
+    :param serializer:
+        Serializes the values below the depth and the keys of the dicts above, e.g. serialize_json.
+    :param depth:
+        The number of dict levels to serialize item by item, e.g. 3 for the operations of the paths of an openapi
+        definition.
+    """
+    serializer = serializer or serialize_json
+    if depth <= 0 or not isinstance(content, dict):
+        yield serializer(content)
+        return
+    separator = b"{"
+    for key, value in content.items():
+        yield separator + serializer(key) + b":"
+        yield from iter_json_chunks(value, serializer, depth - 1)
+        separator = b","
+    yield b"}" if separator == b"," else b"{}"
+
+
+def etag_matches(if_none_match: Union[str, None], etag: str) -> bool:
+    """Checks if an If-None-Match header matches the ETag, using the weak comparison of RFC 9110."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def select_encoding(
+    accept_encoding: Union[str, None], encodings: Iterable[str]
+) -> Union[str, None]:
+    """
+    Selects the preferred content coding of an Accept-Encoding header.
+
+    :param accept_encoding:
+        The Accept-Encoding header.
+    :param encodings:
+        The available content codings in order of preference.
+    :return:
+        The selected content coding or None if the identity should be used.
+    """
+    if not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for coding in accept_encoding.lower().split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip()] = quality
+
+    selected, selected_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > selected_quality:
+            selected, selected_quality = encoding, quality
+    return selected
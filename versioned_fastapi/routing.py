@@ -0,0 +1,325 @@
+import copy
+import re
+import threading
+from typing import Any, Callable, Dict, List, Tuple, TypeVar, Union
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.dependencies.utils import get_body_field
+from fastapi.routing import APIRoute
+from starlette.datastructures import URLPath
+from starlette.routing import BaseRoute, Match, NoMatchFound, compile_path
+from starlette.types import Message, Receive, Scope, Send
+
+try:
+    from starlette._utils import get_route_path
+except ImportError:  # pragma: no cover
+
+    def get_route_path(scope: Scope) -> str:
+        # Before Starlette 0.33.0 the path did not contain the root path
+        return scope["path"]
+
+
+APIRouteT = TypeVar("APIRouteT", bound=APIRoute)
+
+ROUTE_SCOPE_KEY = "versioned_fastapi.route"
+"""The scope key of the route matched by the VersionDispatcher."""
+NEGOTIATED_SCOPE_KEY = "versioned_fastapi.negotiated_version"
+"""The scope key of the version negotiated via headers by the VersionDispatcher."""
+VERSION_SCOPE_KEY = "versioned_fastapi.version"
+"""The scope key of the version matched by the VersionDispatcher, via path prefix or headers."""
+
+
+class VersionDispatcher(BaseRoute):
+    """
+    A route, which dispatches requests to the routes of a single version by looking up the path's version prefix.
+
+    In contrast to Starlette's route list, which matches each route one after the other, the costs of matching only
+    depend on the number of routes in the requested version. The routes of the versions are matched against the path
+    without the version prefix.
+
+    Optionally, requests without version prefix can select a version via a header or a parameter of the Accept header,
+    e.g. "Accept: application/vnd.example+json;version=2". The negotiated version is memoized per distinct header value.
+    """
+
+    max_negotiated_versions: int = 1024
+    """The maximum number of memoized header values, the memo will be cleared if exceeded."""
+
+    def __init__(
+        self,
+        prefix_format: str,
+        *,
+        version_header: Union[str, None] = None,
+        accept_version_parameter: Union[str, None] = None,
+    ):
+        """
+        :param prefix_format:
+            The format of the path prefix, must contain "{version}".
+        :param version_header:
+            The header to select a version for requests without version prefix, e.g. "X-API-Version".
+            Leave None to ignore the header.
+        :param accept_version_parameter:
+            The media type parameter of the Accept header to select a version for requests without version prefix,
+            e.g. "version". Leave None to ignore the Accept header.
+        """
+        self.prefix_format = prefix_format
+        self.mount_paths: List[str] = []
+        self.set_mount_paths([])
+        self.routes_by_version: Dict[str, List[BaseRoute]] = {}
+        self._route_factories: Dict[str, Callable[[], List[BaseRoute]]] = {}
+        self._lock = threading.Lock()
+        self.version_header = version_header and version_header.lower().encode(
+            "latin-1"
+        )
+        self.accept_regex = accept_version_parameter and re.compile(
+            rb";\s*"
+            + re.escape(accept_version_parameter.lower().encode("latin-1"))
+            + rb'\s*=\s*"?([^\s,;"]+)'
+        )
+        self._negotiated_versions: Dict[
+            Tuple[Union[bytes, None], Union[bytes, None]], Union[str, None]
+        ] = {}
+
+    def set_mount_paths(self, mount_paths: List[str]):
+        """
+        Sets the paths of mounted apps, whose routes are contained in the versions. Their version prefix follows the
+        mount path, e.g. "/admin/v1/items".
+        """
+        self.mount_paths = sorted(mount_paths, key=len, reverse=True)
+        mounts = "|".join(re.escape(p) for p in self.mount_paths)
+        before, _, after = self.prefix_format.partition("{version}")
+        self.prefix_regex = re.compile(
+            f"^(?P<mount>{mounts})?{re.escape(before)}(?P<version>[^/]+?){re.escape(after)}(?=/|$)"
+        )
+
+    def _get_mount_path(self, path: str) -> str:
+        """Gets the mount path the path starts with or an empty string."""
+        for mount_path in self.mount_paths:
+            if path == mount_path or path.startswith(mount_path + "/"):
+                return mount_path
+        return ""
+
+    def add_version(self, version: str, routes: List[BaseRoute]):
+        """
+        Adds the routes of a version, replacing previously added routes of the version.
+
+        :param version:
+            The version.
+        :param routes:
+            The routes of the version, without version prefix.
+        """
+        with self._lock:
+            self._route_factories.pop(version, None)
+            self.routes_by_version[version] = routes
+        self._negotiated_versions.clear()
+
+    def add_lazy_version(self, version: str, factory: Callable[[], List[BaseRoute]]):
+        """
+        Adds a version, whose routes will be created on the first request of the version. Previously added routes of
+        the version will be replaced.
+
+        :param version:
+            The version.
+        :param factory:
+            Creates the routes of the version, without version prefix. Will be called once.
+        """
+        with self._lock:
+            self.routes_by_version.pop(version, None)
+            self._route_factories[version] = factory
+        self._negotiated_versions.clear()
+
+    @property
+    def versions(self) -> List[str]:
+        """All versions, including versions whose routes are not yet created."""
+        return [*self.routes_by_version, *self._route_factories]
+
+    def get_routes(self, version: str) -> Union[List[BaseRoute], None]:
+        """Gets the routes of a version and creates them, if necessary. Returns None for unknown versions."""
+        routes = self.routes_by_version.get(version)
+        if routes is None and version in self._route_factories:
+            with self._lock:
+                # Another thread might have created the routes in the meantime
+                routes = self.routes_by_version.get(version)
+                if routes is None:
+                    routes = self._route_factories[version]()
+                    self.routes_by_version[version] = routes
+                    del self._route_factories[version]
+        return routes
+
+    @property
+    def routes(self) -> List[BaseRoute]:
+        """All routes of all versions."""
+        return [r for v in self.versions for r in self.get_routes(v) or []]
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope["type"] not in ("http", "websocket"):
+            return Match.NONE, {}
+        route_path = get_route_path(scope)
+        prefix_match = self.prefix_regex.match(route_path)
+        if prefix_match is not None:
+            version = prefix_match.group("version")
+            routes = self.routes_by_version.get(version)
+            if routes is None and self._route_factories:
+                routes = self.get_routes(version)
+            mount_path = prefix_match.group("mount") or ""
+            unversioned_path = route_path[prefix_match.end() :]
+            if not mount_path and self._get_mount_path(unversioned_path):
+                # Routes of mounted apps are only available after the mount path, e.g. not at "/v1/admin/items"
+                routes = None
+            if routes is not None:
+                path = scope["path"]
+                version_scope = dict(scope)
+                version_scope["path"] = (
+                    path[: len(path) - len(route_path)] + mount_path + unversioned_path
+                )
+                match, child_scope = self._match_routes(routes, version_scope)
+                if match != Match.NONE:
+                    child_scope[VERSION_SCOPE_KEY] = version
+                return match, child_scope
+
+        if self.version_header or self.accept_regex:
+            version = self._negotiate_version(scope)
+            if version is not None:
+                match, child_scope = self._match_routes(
+                    self.get_routes(version) or [], scope
+                )
+                if match != Match.NONE:
+                    child_scope[NEGOTIATED_SCOPE_KEY] = version
+                    child_scope[VERSION_SCOPE_KEY] = version
+                return match, child_scope
+        return Match.NONE, {}
+
+    def _negotiate_version(self, scope: Scope) -> Union[str, None]:
+        """Gets the version selected by the request headers, if the version exists."""
+        header_value = accept = None
+        for name, value in scope["headers"]:
+            if name == self.version_header:
+                header_value = value
+            elif name == b"accept":
+                accept = value
+        key = (header_value, accept)
+        try:
+            return self._negotiated_versions[key]
+        except KeyError:
+            pass
+
+        version = None
+        if header_value:
+            version = header_value.decode("latin-1").strip()
+        elif accept and self.accept_regex:
+            if accept_match := self.accept_regex.search(accept.lower()):
+                version = accept_match.group(1).decode("latin-1")
+        if version not in self.routes_by_version and version not in (
+            self._route_factories
+        ):
+            version = None
+
+        if len(self._negotiated_versions) >= self.max_negotiated_versions:
+            self._negotiated_versions.clear()
+        self._negotiated_versions[key] = version
+        return version
+
+    @staticmethod
+    def _match_routes(
+        routes: List[BaseRoute], scope: Scope
+    ) -> Tuple[Match, Dict[str, Any]]:
+        """Matches the routes like Starlette's router does and adds the matched route to the child scope."""
+        partial: Union[Tuple[Match, Dict[str, Any]], None] = None
+        for route in routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return match, {**child_scope, ROUTE_SCOPE_KEY: route}
+            if match == Match.PARTIAL and partial is None:
+                partial = match, {**child_scope, ROUTE_SCOPE_KEY: route}
+        return partial or (Match.NONE, {})
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope.get(NEGOTIATED_SCOPE_KEY) is None:
+            await scope[ROUTE_SCOPE_KEY].handle(scope, receive, send)
+            return
+
+        vary = b", ".join(
+            h for h in (self.version_header, self.accept_regex and b"accept") if h
+        )
+
+        async def send_with_vary(message: Message) -> None:
+            # Negotiated responses must not be cached for other header values
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"vary", vary)]
+            await send(message)
+
+        await scope[ROUTE_SCOPE_KEY].handle(scope, receive, send_with_vary)
+
+    def url_path_for(self, name: str, /, **path_params: Any) -> URLPath:
+        for version in self.versions:
+            for route in self.get_routes(version) or []:
+                try:
+                    url_path = route.url_path_for(name, **path_params)
+                except NoMatchFound:
+                    continue
+                prefix = self.prefix_format.format(version=version)
+                mount_path = self._get_mount_path(url_path)
+                return URLPath(
+                    mount_path + prefix + url_path[len(mount_path) :],
+                    protocol=url_path.protocol,
+                )
+        raise NoMatchFound(name, path_params)
+
+
+def copy_route(route: APIRouteT, prefix: str, mount_path: str = "") -> APIRouteT:
+    """
+    Creates a lightweight copy of the route with the prefix added to its path.
+    The mount path of a route of a mounted app will be added in front of the prefix.
+
+    In contrast to APIRouter.include_router, the copy shares the dependant, the body and response fields and the request
+    handler with the route. Only the path, its compiled regex and the unique id derived from it are replaced.
+    """
+    prefixed_route = copy.copy(route)
+    prefixed_route.path = mount_path + prefix + route.path
+    (
+        prefixed_route.path_regex,
+        prefixed_route.path_format,
+        prefixed_route.param_convertors,
+    ) = compile_path(prefixed_route.path)
+    prefixed_route.unique_id = route.operation_id or generate_unique_id(prefixed_route)
+    return prefixed_route
+
+
+def rename_body_field(route: APIRouteT) -> APIRouteT:
+    """
+    Gets the route or, if its body parameters are embedded in a model named after the unique id of another route, a
+    copy of it with a model named after its own unique id, like APIRouter.include_router creates.
+
+    The copies of copy_route share the model with the route, so the copies of different endpoints with equal names and
+    paths, e.g. of different versions, would have equally named models in the same openapi definition.
+    """
+    body_field = route.body_field
+    if body_field is None or body_field.type_.__name__ == f"Body_{route.unique_id}":
+        return route
+    renamed_body_field = get_body_field(dependant=route.dependant, name=route.unique_id)
+    if renamed_body_field is body_field:
+        # A single body parameter is not embedded
+        return route
+    renamed_route = copy.copy(route)
+    renamed_route.body_field = renamed_body_field
+    return renamed_route
+
+
+def get_prefixed_unique_id(route: APIRoute, prefix: str, mount_path: str = "") -> str:
+    """
+    Gets the unique id, which copy_route would assign to the copy of the route with the prefix, e.g. its operationId.
+    The path of the route is not compiled again, so this is cheaper than copying the route.
+    """
+    if route.operation_id:
+        return route.operation_id
+    prefixed_route = copy.copy(route)
+    prefixed_route.path = mount_path + prefix + route.path
+    prefixed_route.path_format = mount_path + prefix + route.path_format
+    return generate_unique_id(prefixed_route)
+
+
+def generate_unique_id(route: APIRoute) -> str:
+    """Generates the unique id of a route with its generate_unique_id_function, like APIRoute does."""
+    generate = route.generate_unique_id_function
+    if isinstance(generate, DefaultPlaceholder):
+        generate = generate.value
+    return generate(route)
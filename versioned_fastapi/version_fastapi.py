@@ -1,26 +1,119 @@
+import asyncio
+import functools
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import threading
 from collections import defaultdict
-from typing import Any, Callable, Dict, Iterable, List, Tuple, TypeVar, Union
+from concurrent.futures import Future
+from pathlib import Path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
-from fastapi import APIRouter, FastAPI, Request
+import fastapi
+import fastapi.exception_handlers
+from fastapi import APIRouter, FastAPI, HTTPException, Request
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.routing import APIRoute
-from starlette.routing import BaseRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import BaseRoute, Mount, Route, Router
+from starlette.types import Scope
+
+from . import __version__
+from .cache import FileCache
+from .converters import Converter, create_converted_route
+from .diff import diff_routes, get_route_signature, hash_value
+from .index import VersionIndex
+from .metrics import MetricsMiddleware, RequestMetrics
+from .openapi import OPENAPI_KEYS, share_components, slice_openapi
+from .responses import (
+    CachedContent,
+    ChunkedContent,
+    iter_json_chunks,
+    serialize_json,
+)
+from .routing import (
+    VERSION_SCOPE_KEY,
+    VersionDispatcher,
+    copy_route,
+    get_prefixed_unique_id,
+    rename_body_field,
+)
+from .versions import VersionRange, VersionSet, get_version_key, parse_version
 
 CallableT = TypeVar("CallableT", bound=Callable[..., Any])
+DEFAULT_EXCEPTION_HANDLERS = tuple(
+    getattr(fastapi.exception_handlers, name)
+    for name in (
+        "http_exception_handler",
+        "request_validation_exception_handler",
+        # Available since FastAPI 0.100.0
+        "websocket_request_validation_exception_handler",
+    )
+    if hasattr(fastapi.exception_handlers, name)
+)
+"""The exception handlers FastAPI adds to every app."""
 
 
-def version(*version: Union[int, str, None]) -> Callable[[CallableT], CallableT]:
+def version(
+    *version: Union[int, str, None],
+    since: Union[int, str, None] = None,
+    until: Union[int, str, None] = None,
+    upgrade: Union[Dict[Union[int, str], Dict[str, Converter]], None] = None,
+    downgrade: Union[Dict[Union[int, str], Converter], None] = None,
+) -> Callable[[CallableT], CallableT]:
     """
-    Annotates a route with one or multiple versions.
+    Annotates a route with one or multiple versions or version ranges.
 
     :param version:
-        One or more versions. Use None to avoid any path modifications.
+        One or more versions or ranges like ">=2,<5", which contain all known versions matching the conditions. Use
+        None to avoid any path modifications.
+    :param since:
+        The first version of the route, e.g. @version(since=2) for version 2 and all later known versions.
+    :param until:
+        The last version of the route, e.g. @version(since=2, until=4) for the known versions from 2 to 4.
+    :param upgrade:
+        Converters of the endpoint's parameters by version and parameter name, which convert the requests of older
+        versions to the models of the endpoint, e.g. {1: {"item": Item}}. A model maps the fields by name, a function
+        converts the value and the annotation of its first parameter is the model of the older version.
+    :param downgrade:
+        Converters of the endpoint's responses by version, which convert them to the models of older versions, e.g.
+        {1: Item}. A model maps the fields by name, a function converts the response and its return annotation is the
+        response model of the older version.
     """
+    route_versions = [None if v is None else parse_version(v) for v in version]
+    conditions = [(">=", since), ("<=", until)]
+    if any(v is not None for _, v in conditions):
+        route_versions.append(
+            VersionRange((o, str(v)) for o, v in conditions if v is not None)
+        )
+
+    converters: Dict[str, Tuple[Dict[str, Converter], Union[Converter, None]]] = {
+        str(v): ((upgrade or {}).get(v, {}), (downgrade or {}).get(v))
+        for v in {*(upgrade or {}), *(downgrade or {})}
+    }
 
     def decorator(func: CallableT) -> CallableT:
-        func._route_version = [None if v is None else str(v) for v in version]
+        func._route_version = route_versions
+        if converters:
+            func._route_converters = converters
         return func
 
     return decorator
@@ -44,6 +137,31 @@ class FastApiVersioner:
     """The URLs to use to load Swagger UI CSS. Leave None to use FastAPIs default."""
     swagger_favicon_url: Union[str, None] = None
     """The URL of the favicon to use. Leave None to use FastAPIs default."""
+    swagger_ui_dir: Union[str, "os.PathLike[str]", None] = None
+    """A directory containing the Swagger UI files to serve instead of loading them from swagger_js_urls, swagger_css_urls and swagger_favicon_url, e.g. swagger_ui_bundle.swagger_ui_path."""
+    swagger_ui_files: Iterable[str] = (
+        "swagger-ui-bundle.js",
+        "swagger-ui-standalone-preset.js",
+        "swagger-ui.css",
+        "favicon-32x32.png",
+    )
+    """The files of swagger_ui_dir to serve, the JavaScript, CSS and favicon files will be used by the swagger docs."""
+    swagger_ui_url: str = "/swagger-ui"
+    """The URL to serve the files of swagger_ui_dir at, followed by a hash of the files to allow caching them forever."""
+    cache_control: Union[str, None] = None
+    """The Cache-Control header of the versioned openapi and docs responses, e.g. "public, max-age=3600". Leave None to omit the header."""
+    compression_minimum_size: Union[int, None] = 500
+    """The minimum size in bytes of an openapi definition to store gzip and brotli compressed variants. Leave None to disable compression."""
+    shared_components_url: str = "/openapi-components.json"
+    """The URL of the document containing the component schemas shared by the versions, if shared_components is True."""
+    metrics_url: Union[str, None] = None
+    """The URL of an endpoint serving the request metrics in the Prometheus text format, e.g. "/metrics". Requires the metrics parameter. Leave None to not add the endpoint."""
+    versions_diff_url: Union[str, None] = None
+    """The URL of an endpoint comparing the routes of two versions, e.g. "/versions/diff", which is requested like "/versions/diff?from=1&to=2". Leave None to not add the endpoint."""
+    max_docs_root_paths: int = 8
+    """The maximum number of root paths to cache the rendered swagger docs for, the least recently used will be dropped."""
+    openapi_chunk_size: int = 65536
+    """The minimum size in bytes of the chunks of the openapi definitions, if stream_openapi is True."""
 
     def __init__(
         self,
@@ -54,6 +172,21 @@ class FastApiVersioner:
         include_all_routes: bool = True,
         primary_swagger_version: Union[int, str, None] = None,
         filter_tags: bool = False,
+        slice_openapi: bool = False,
+        dispatch: Literal["routes", "prefix"] = "routes",
+        version_header: Union[str, None] = None,
+        accept_version_parameter: Union[str, None] = None,
+        inherit_routes: bool = False,
+        lazy: bool = False,
+        openapi_dir: Union[str, "os.PathLike[str]", None] = None,
+        shared_components: bool = False,
+        metrics: Union[RequestMetrics, None] = None,
+        include_mounts: bool = False,
+        serializer: Callable[[Any], bytes] = serialize_json,
+        cache_dir: Union[str, "os.PathLike[str]", None] = None,
+        known_versions: Iterable[Union[int, str]] = (),
+        version_key: Callable[[str], Any] = get_version_key,
+        stream_openapi: bool = False,
     ):
         """
         :param app:
@@ -69,7 +202,77 @@ class FastApiVersioner:
             If None "All Routes" or the first version will be selected.
         :param filter_tags:
             If True, only tags used by the selected version will be displayed in swagger. Will not effect the "All Routes" version.
+        :param slice_openapi:
+            If True, the openapi definition of all versioned routes will be generated once, each route only once
+            however many versions contain it, and the definitions of the versions will be sliced from it with their
+            paths and operationIds, instead of generating each version separately. This is faster for many
+            versions, but the names of models might differ, e.g. if a model is used as input in one version and as
+            output in another.
+        :param dispatch:
+            Defines how requests are matched to the versioned routes.
+            With "routes" the versioned routes are added to the app's routes and matched one after the other.
+            With "prefix" the version is taken from the path prefix and only the routes of that version are matched,
+            which is faster for many versions and routes.
+        :param version_header:
+            The header to select a version for requests without version prefix, e.g. "X-API-Version".
+            Requires dispatch="prefix".
+        :param accept_version_parameter:
+            The media type parameter of the Accept header to select a version for requests without version prefix,
+            e.g. "version" for "Accept: application/vnd.example+json;version=2". Requires dispatch="prefix".
+        :param inherit_routes:
+            If True, each version will contain the routes of previous versions, unless the version has a route with the
+            same path and method. Use dispatch="prefix" to avoid copying the inherited routes into each version.
+        :param lazy:
+            If True, the routes of a version will be created on its first request instead of on startup, which speeds up
+            the startup of apps with many versions. Use warmup() to create versions in advance. Requires
+            dispatch="prefix".
+        :param openapi_dir:
+            A directory written by export() or "python -m versioned_fastapi export". The openapi definitions and their
+            compressed variants will be read from it instead of being generated. Missing definitions will be generated.
+        :param shared_components:
+            If True, component schemas which are equal in all versions using them will be moved to a single document
+            served at shared_components_url and referenced by the versions' openapi definitions. This reduces the size of
+            the definitions, but requires generating the definitions of all versions on the first request.
+        :param metrics:
+            Records the number and duration of requests per version and route, e.g. RequestMetrics(sample_rate=0.1).
+            A middleware is added to the app, which must be versioned before it handles its first request.
+        :param include_mounts:
+            If True, the routes of mounted FastAPI apps will be versioned as well, e.g. "/admin/v1/items" for the route
+            "/items" of an app mounted at "/admin". The routes are handled by the main app and included in its openapi
+            definitions and docs. Mounted apps with their own versioner will be ignored. Mounted apps with middlewares or
+            exception handlers raise a ValueError, as these would not apply to the routes handled by the main app.
+        :param serializer:
+            Serializes the openapi definitions to JSON once before they are cached. By default, orjson will be used if
+            installed, otherwise the json module.
+        :param cache_dir:
+            A directory to share the serialized openapi definitions between processes, e.g. the workers of a server.
+            The definition of a version is generated by the first worker requesting it and mapped read-only into
+            memory by all workers, so they share its memory pages. The files are keyed by a hash of the version's
+            settings, including the app version, and of its routes, whose models are described by their fields.
+            Increase the app version or clear the directory, if a change that the hash does not cover, e.g. of a
+            custom JSON schema, is deployed. Use a RAM backed directory like "/dev/shm/versioned_fastapi" to avoid
+            disk IO. Not used with shared_components.
+        :param known_versions:
+            Versions to include in version ranges like @version(since=2) in addition to the versions of the routes,
+            e.g. a new version without new routes.
+        :param version_key:
+            Gets the sort key of a version, used to order the versions and to expand version ranges. By default,
+            numbers are compared numerically, e.g. "2" < "10", "1.2.0" < "1.10.0" and "2024-01-31" < "2024-02-01".
+        :param stream_openapi:
+            If True, the versioned openapi definitions will be serialized path by path into chunks, which are cached
+            and streamed, instead of a single body. This avoids a second copy of very large definitions while they are
+            serialized and compressed. Requires a serializer, which creates compact JSON like the default one.
         """
+        if dispatch not in ("routes", "prefix"):
+            raise ValueError(
+                f'Unknown dispatch "{dispatch}", use "routes" or "prefix".'
+            )
+        if (version_header or accept_version_parameter) and dispatch != "prefix":
+            raise ValueError(
+                'Version negotiation via headers requires dispatch="prefix".'
+            )
+        if lazy and dispatch != "prefix":
+            raise ValueError('Lazy versions require dispatch="prefix".')
         self.app = app
         self.default_version: Union[str, None] = (
             str(default_version) if default_version is not None else None
@@ -80,174 +283,1185 @@ class FastApiVersioner:
         )
         self.include_main_openapi = include_all_routes
         self.filter_tags = filter_tags
+        self.slice_openapi = slice_openapi
+        self.dispatch = dispatch
+        self.version_header = version_header
+        self.accept_version_parameter = accept_version_parameter
+        self.inherit_routes = inherit_routes
+        self.lazy = lazy
+        self.openapi_dir = openapi_dir and Path(openapi_dir)
+        self.shared_components = shared_components
+        self.metrics = metrics
+        self.include_mounts = include_mounts
+        self.serializer = serializer
+        self._file_cache = FileCache(cache_dir) if cache_dir else None
+        self.known_versions = [str(v) for v in known_versions]
+        self.version_key = version_key
+        self.stream_openapi = stream_openapi
+        self._version_set = VersionSet([], version_key)
+        self._range_routes: List[Tuple[APIRoute, List[VersionRange], str]] = []
+        self._versioned = False
+        self._processed_route_ids: Set[int] = set()
+        self.version_index = VersionIndex()
+        self._mounted_routes: Dict[int, APIRoute] = {}
+        self._converted_routes: Dict[Tuple[int, str], APIRoute] = {}
+        self._versioned_routes: Dict[str, List[BaseRoute]] = {}
+        self._dispatcher: Union[VersionDispatcher, None] = None
+        self._docs_contents: Any = None
+        self._route_table: Dict[Tuple[str, str, str], APIRoute] = {}
+        self._openapi_source: Union[Dict[str, Any], None] = None
+        self._openapi_source_lock = threading.Lock()
+        self._source_paths: Dict[int, str] = {}
+        self._openapi_kwargs: Dict[str, Dict[str, Any]] = {}
+        self._prefixed_routes: Dict[str, List[BaseRoute]] = {}
+        self._openapi_cache: Dict[str, CachedContent] = {}
+        self._openapi_futures: Dict[str, Future[CachedContent]] = {}
+        self._openapi_lock = threading.Lock()
+        self._swagger_ui_url: Union[str, None] = None
+        self._swagger_ui_media_types: Dict[str, str] = {}
+        self._swagger_ui_assets: Dict[str, CachedContent] = {}
+        self._components_content: Union[CachedContent, None] = None
+        self._components_lock = threading.Lock()
+        self._route_signatures: Dict[int, Dict[str, str]] = {}
+        self._model_descriptions: Dict[type, str] = {}
+        self._diffs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._versions_by_route: Dict[int, Tuple[str, str]] = {}
 
     def version_fastapi(self) -> List[str]:
         """
         Versions the fastapi app by adding a prefix to the route's path.
 
+        Can be called again to version routes added afterwards, e.g. by plugins or by app.include_router. Then only the
+        versions of the new routes are rebuilt and only their cached openapi definitions are invalidated.
+
         :return:
-            All used versions as sorted list of strings.
+            All used versions as list of strings, sorted by version_key.
         """
-        routes_by_version, routes_to_remove = self._get_routes()
-        self.app.router.routes = [
-            r for r in self.app.router.routes if r not in routes_to_remove
+        is_first_call = not self._versioned
+        self._versioned = True
+        new_index, removed_route_ids = self._get_routes()
+        for router, _ in self._iter_routers():
+            if any(id(r) in removed_route_ids for r in router.routes):
+                router.routes = [
+                    r for r in router.routes if id(r) not in removed_route_ids
+                ]
+        self.version_index.update(new_index)
+        for entry in new_index:
+            # Invalid converters fail on startup, even if the version is created lazily
+            self._get_converted_route(entry.version, entry.route)
+
+        if is_first_call:
+            # Allows tools like "python -m versioned_fastapi export" to find the versioner of the app
+            self.app.state.versioner = self
+            if self.dispatch == "prefix":
+                self._dispatcher = VersionDispatcher(
+                    self.prefix_format,
+                    version_header=self.version_header,
+                    accept_version_parameter=self.accept_version_parameter,
+                )
+                self._add_app_routes([self._dispatcher])
+            # A custom openapi function assigned to the app is kept, it can wrap ours, if assigned afterwards
+            if "openapi" not in vars(self.app):
+                self.app.openapi = self._get_main_openapi  # type: ignore[method-assign]
+
+        if self._dispatcher is not None:
+            self._dispatcher.set_mount_paths(list(self.version_index.mount_paths))
+        changed_versions = self._get_changed_versions(new_index)
+        routes_by_version = self._get_effective_routes(new_index, changed_versions)
+        self._add_versions(routes_by_version)
+
+        if is_first_call:
+            if self.shared_components and self.app.openapi_url:
+                self._add_shared_components_route()
+            if self.versions_diff_url:
+                self._add_versions_diff_route()
+            if self.metrics is not None:
+                self._add_metrics()
+            if self.openapi_dir and self.app.openapi_url:
+                path = self._get_export_path(self.openapi_dir, self.app.openapi_url)
+                if path.is_file():
+                    self.app.openapi_schema = json.loads(path.read_bytes())
+            if self.app.openapi_url and self.app.docs_url:
+                self._override_swagger_docs()
+        elif changed_versions:
+            for version in changed_versions:
+                self.invalidate_openapi(version)
+            self.app.openapi_schema = None
+            self._diffs = {
+                k: d for k, d in self._diffs.items() if not changed_versions & set(k)
+            }
+            if self._docs_contents is not None:
+                self._docs_contents.cache_clear()
+
+        self._processed_route_ids = {
+            id(r) for router, _ in self._iter_routers() for r in router.routes
+        }
+        return self._sort_versions(self.version_index.versions)
+
+    def _sort_versions(self, versions: Iterable[str]) -> List[str]:
+        """Sorts versions in ascending order by version_key."""
+        return sorted(versions, key=self.version_key)
+
+    def _get_routes(self) -> Tuple[VersionIndex, Set[int]]:
+        """
+        Indexes the annotated routes, which were not processed by a previous call of version_fastapi.
+
+        :return:
+            The index of the new routes and the ids of the routes to remove from their routers.
+        """
+        index = VersionIndex()
+        removed_route_ids: Set[int] = set()
+        annotated_routes: List[Tuple[APIRoute, List[str], List[VersionRange], str]] = []
+        known_versions = {*self.known_versions, *self.version_index.versions}
+
+        for router, mount_path in self._iter_routers():
+            for route in router.routes:
+                if id(route) in self._processed_route_ids:
+                    continue
+                if isinstance(route, APIRoute):
+                    route_versions: List[Union[str, VersionRange, None]] = getattr(
+                        route.endpoint, "_route_version", [self.default_version]
+                    )
+                    versions = [v for v in route_versions if isinstance(v, str)]
+                    ranges = [v for v in route_versions if isinstance(v, VersionRange)]
+                    if versions or ranges:
+                        known_versions.update(versions)
+                        annotated_routes.append((route, versions, ranges, mount_path))
+                        removed_route_ids.add(id(route))
+                if not mount_path and getattr(route, "path", None) == self.app.docs_url:
+                    removed_route_ids.add(id(route))
+
+        # The ranges are expanded after all versions are known, ranges of previous calls only by the new versions
+        version_set = VersionSet(known_versions, self.version_key)
+        for route, versions, ranges, _ in annotated_routes:
+            if not versions and not any(version_set.expand(r) for r in ranges):
+                raise ValueError(
+                    f"The version ranges {ranges} of the endpoint {route.name} match no known version, "
+                    "add the versions to known_versions."
+                )
+        previous_versions = set(self._version_set.versions)
+        self._version_set = version_set
+        if len(self._version_set.versions) > len(previous_versions):
+            for route, ranges, mount_path in self._range_routes:
+                index.add(
+                    route,
+                    [
+                        v
+                        for v in self._expand_ranges(ranges)
+                        if v not in previous_versions
+                    ],
+                    mount_path,
+                )
+        for route, versions, ranges, mount_path in annotated_routes:
+            if ranges:
+                versions = list(
+                    dict.fromkeys([*versions, *self._expand_ranges(ranges)])
+                )
+                self._range_routes.append((route, ranges, mount_path))
+            index.add(route, versions, mount_path)
+        return index, removed_route_ids
+
+    def _expand_ranges(self, ranges: List[VersionRange]) -> List[str]:
+        """Gets the known versions within any of the ranges."""
+        if len(ranges) == 1:
+            return self._version_set.expand(ranges[0])
+        return self._sort_versions(
+            {v for r in ranges for v in self._version_set.expand(r)}
+        )
+
+    def _iter_routers(self) -> Iterator[Tuple[Router, str]]:
+        """Iterates the router of the app and, if include_mounts is True, the routers of mounted FastAPI apps."""
+        routers = [(self.app.router, "")]
+        while routers:
+            router, mount_path = routers.pop(0)
+            yield router, mount_path
+            if not self.include_mounts:
+                continue
+            for route in router.routes:
+                if (
+                    isinstance(route, Mount)
+                    and isinstance(route.app, FastAPI)
+                    and getattr(route.app.state, "versioner", None) is None
+                ):
+                    self._check_mounted_app(route.app, mount_path + route.path)
+                    routers.append((route.app.router, mount_path + route.path))
+
+    @staticmethod
+    def _check_mounted_app(app: FastAPI, mount_path: str):
+        """
+        Raises a ValueError, if a mounted app has middlewares or exception handlers, which would not apply to its routes
+        when they are handled by the main app, e.g. an authentication middleware.
+        """
+        custom_handlers = [
+            e
+            for e, h in app.exception_handlers.items()
+            if h not in DEFAULT_EXCEPTION_HANDLERS
         ]
+        if app.user_middleware or custom_handlers:
+            raise ValueError(
+                f'The app mounted at "{mount_path}" has middlewares or exception handlers, which would be bypassed by '
+                "include_mounts. Add them to the main app or version the mounted app with its own versioner."
+            )
 
-        for version, routes in routes_by_version.items():
-            router = self._create_versioned_router(version, routes)
-            self.app.include_router(router)
+    def _get_route_path(self, route: APIRoute) -> str:
+        """Gets the path of a route including the path of its mounted app, if any."""
+        return self.version_index.get_mount_path(route) + route.path
+
+    def _add_app_routes(self, routes: List[BaseRoute]):
+        """Adds routes to the app. With include_mounts they are added before the mounts, which would shadow them."""
+        app_routes = self.app.router.routes
+        index = len(app_routes)
+        if self.include_mounts:
+            index = next(
+                (i for i, r in enumerate(app_routes) if isinstance(r, Mount)), index
+            )
+        app_routes[index:index] = routes
 
-        versions = sorted(routes_by_version.keys())
-        if self.app.openapi_url and self.app.docs_url:
-            self._override_swagger_docs(versions)
+    def _get_changed_versions(self, new_index: VersionIndex) -> Set[str]:
+        """Gets the versions, which need to be rebuilt due to new routes."""
+        changed_versions = set(new_index.versions)
+        if self.inherit_routes and changed_versions:
+            # Later versions might inherit the new routes
+            sorted_versions = self._sort_versions(self.version_index.versions)
+            first_index = min(sorted_versions.index(v) for v in changed_versions)
+            changed_versions.update(sorted_versions[first_index:])
+        return changed_versions
 
-        return versions
+    def _get_effective_routes(
+        self,
+        new_index: VersionIndex,
+        changed_versions: Set[str],
+    ) -> Dict[str, List[APIRoute]]:
+        """Gets the routes of the changed versions and updates the route table."""
+        versions = self.version_index.versions
+        if self.inherit_routes:
+            routes_by_version = {v: self.version_index.get_routes(v) for v in versions}
+            self._inherit_routes(routes_by_version)
+            return {v: routes_by_version[v] for v in versions if v in changed_versions}
+
+        for entry in new_index:
+            for method in entry.route.methods:
+                # Like Starlette, the first route matching a path and method is used
+                self._route_table.setdefault(
+                    (entry.version, entry.path, method), entry.route
+                )
+        return {
+            v: self.version_index.get_routes(v)
+            for v in versions
+            if v in changed_versions
+        }
 
-    def _get_routes(self) -> Tuple[Dict[str, List[APIRoute]], List[BaseRoute]]:
-        """Gets versions and routes."""
-        routes_by_version: Dict[str, List[APIRoute]] = defaultdict(list)
-        routes_to_remove: List[BaseRoute] = []
+    def _add_versions(self, routes_by_version: Dict[str, List[APIRoute]]):
+        """Adds the routes of the versions to the app, replacing the routes previously added for these versions."""
+        dispatcher = self._dispatcher
+        if dispatcher is None:
+            stale_route_ids = {
+                id(r)
+                for v in routes_by_version
+                for r in self._versioned_routes.pop(v, [])
+            }
+            if stale_route_ids:
+                self.app.router.routes = [
+                    r for r in self.app.router.routes if id(r) not in stale_route_ids
+                ]
+                for route_id in stale_route_ids:
+                    self._versions_by_route.pop(route_id, None)
 
-        for route in self.app.routes:
-            if isinstance(route, APIRoute):
-                route_versions: List[Union[str, None]] = getattr(
-                    route.endpoint, "_route_version", [self.default_version]
+        for version, routes in routes_by_version.items():
+            if dispatcher is None:
+                router = self._create_versioned_router(version, routes)
+                # The routes are already prefixed, including them would copy them again
+                self._add_app_routes(router.routes)
+                self._versioned_routes[version] = router.routes
+                self._versions_by_route.update(
+                    {
+                        id(p): (version, self._get_route_path(r))
+                        for r, p in zip(routes, router.routes)
+                    }
+                )
+            elif self.lazy:
+                dispatcher.add_lazy_version(
+                    version,
+                    functools.partial(
+                        self._create_dispatched_routes, version, list(routes)
+                    ),
+                )
+            else:
+                dispatcher.add_version(
+                    version, self._create_dispatched_routes(version, routes)
                 )
-                for version in route_versions:
-                    if version is not None:
-                        routes_by_version[version].append(route)
-                        routes_to_remove.append(route)
-            if getattr(route, "path", None) == self.app.docs_url:
-                routes_to_remove.append(route)
 
-        return routes_by_version, routes_to_remove
+    def _inherit_routes(self, routes_by_version: Dict[str, List[APIRoute]]):
+        """
+        Adds the routes of previous versions to each version, if their path and method is not used by the version.
+        The resulting table from version, path and method to the effective route is stored in _route_table.
+        """
+        self._route_table = {}
+        effective_routes: Dict[Tuple[str, str], APIRoute] = {}
+        for version in self._sort_versions(routes_by_version):
+            routes = routes_by_version[version]
+            own_route_ids = {id(r) for r in routes}
+            effective_routes.update(
+                {
+                    (self._get_route_path(route), method): route
+                    for route in routes
+                    for method in route.methods
+                }
+            )
+            inherited_routes = {
+                id(r): r
+                for r in effective_routes.values()
+                if id(r) not in own_route_ids
+            }
+            routes.extend(inherited_routes.values())
+            self._route_table.update(
+                {
+                    (version, path, method): r
+                    for (path, method), r in effective_routes.items()
+                }
+            )
+
+    def _create_prefixed_routes(
+        self, version: str, routes: List[APIRoute]
+    ) -> List[BaseRoute]:
+        """Creates lightweight copies of the routes with the version prefix added to their path."""
+        version_prefix = self.prefix_format.format(version=version)
+        return [
+            copy_route(
+                self._get_converted_route(version, route),
+                version_prefix,
+                self.version_index.get_mount_path(route),
+            )
+            for route in routes
+        ]
 
     def _create_versioned_router(
         self, version: str, routes: List[APIRoute]
     ) -> APIRouter:
-        """Creates a routes with all routes."""
-        version_prefix = self.prefix_format.format(version=version)
-        _router = APIRouter()
-        _router.routes.extend(routes)
-        router = APIRouter(prefix=version_prefix)
-        router.include_router(_router)
+        """Creates a router with all routes of a version."""
+        router = APIRouter(prefix=self.prefix_format.format(version=version))
+        prefixed_routes = self._create_prefixed_routes(version, routes)
+        router.routes.extend(prefixed_routes)
         if self.app.openapi_url:
-            self._add_openapi_route(version, router)
+            self._prefixed_routes[version] = prefixed_routes
+            self._add_openapi_route(version, router, routes)
         return router
 
-    def _add_openapi_route(self, version: str, router: APIRouter):
-        """Adds an openapi route to the router."""
-        openapi_kwargs = {
-            "title": self.title_format.format(title=self.app.title, version=version),
-            "description": self.description_format.format(
+    def _create_dispatched_routes(
+        self, version: str, routes: List[APIRoute]
+    ) -> List[BaseRoute]:
+        """Creates the routes of a version for the VersionDispatcher, their paths have no version prefix."""
+        dispatched_routes: List[BaseRoute] = []
+        for route in routes:
+            converted_route = self._get_converted_route(version, route)
+            mount_path = self.version_index.get_mount_path(route)
+            if converted_route is not route:
+                if mount_path:
+                    converted_route = copy_route(converted_route, "", mount_path)
+                dispatched_routes.append(converted_route)
+            elif mount_path:
+                dispatched_routes.append(self._get_mounted_route(route))
+            else:
+                dispatched_routes.append(route)
+        if self.app.openapi_url:
+            # The prefixed copies for the openapi definition are created by _get_openapi_routes on first use
+            self._prefixed_routes.pop(version, None)
+            dispatched_routes.append(
+                Route(
+                    self.app.openapi_url,
+                    self._create_openapi_endpoint(version, routes),
+                    include_in_schema=False,
+                )
+            )
+        return dispatched_routes
+
+    def _get_openapi_routes(self, version: str) -> Sequence[BaseRoute]:
+        """
+        Gets the routes of the openapi definition of a version. The openapi arguments contain the routes without
+        version prefix. With dispatch="prefix", their prefixed copies are created once, when they are first needed.
+        """
+        prefixed_routes = self._prefixed_routes.get(version)
+        if prefixed_routes is None:
+            prefixed_routes = self._prefixed_routes[version] = (
+                self._create_prefixed_routes(
+                    version, self._openapi_kwargs[version]["routes"]
+                )
+            )
+        return prefixed_routes
+
+    def _get_converted_route(self, version: str, route: APIRoute) -> APIRoute:
+        """
+        Gets a copy of the route converting the requests and responses of the version, if its endpoint has converters
+        for the version, otherwise the route. The copies are created once.
+        """
+        converters = getattr(route.endpoint, "_route_converters", {}).get(version)
+        if converters is None:
+            return route
+        key = (id(route), version)
+        converted_route = self._converted_routes.get(key)
+        if converted_route is None:
+            request_converters, response_converter = converters
+            converted_route = self._converted_routes[key] = create_converted_route(
+                route,
+                request_converters=request_converters,
+                response_converter=response_converter,
+            )
+        return converted_route
+
+    def _get_mounted_route(self, route: APIRoute) -> APIRoute:
+        """Gets a copy of a route of a mounted app with the mount path added to its path, shared by all versions."""
+        mounted_route = self._mounted_routes.get(id(route))
+        if mounted_route is None:
+            mounted_route = self._mounted_routes[id(route)] = copy_route(
+                route, "", self.version_index.get_mount_path(route)
+            )
+        return mounted_route
+
+    def _get_openapi_kwargs(
+        self, version: Union[str, None], routes: Sequence[BaseRoute]
+    ) -> Dict[str, Any]:
+        """Gets the arguments of get_openapi for a version or for all routes, if the version is None."""
+        if version is None:
+            title = self.app.title
+            description = self.app.description
+        else:
+            title = self.title_format.format(title=self.app.title, version=version)
+            description = self.description_format.format(
                 description=self.app.description, version=version
-            ),
+            )
+        openapi_kwargs = {
+            "title": title,
+            "description": description,
             "version": self.app.version,
             "terms_of_service": self.app.terms_of_service,
             "contact": self.app.contact,
             "license_info": self.app.license_info,
             "openapi_version": self.app.openapi_version,
-            "routes": router.routes,
+            "routes": routes,
             "tags": self.app.openapi_tags,
             "servers": self.app.servers,
         }
         # Available since OpenAPI 3.1.0, FastAPI 0.99.0.
         if summary := getattr(self.app, "summary", None):
-            openapi_kwargs["summary"] = self.summary_format.format(
-                summary=summary, version=version
+            openapi_kwargs["summary"] = (
+                summary
+                if version is None
+                else self.summary_format.format(summary=summary, version=version)
             )
         if webhooks := getattr(self.app, "webhooks", None):
             openapi_kwargs["webhooks"] = webhooks.routes
         # Available since FastAPI 0.102.0
         if separate_schemas := getattr(self.app, "separate_input_output_schemas", None):
             openapi_kwargs["separate_input_output_schemas"] = separate_schemas
+        return openapi_kwargs
 
-        async def get_versioned_openapi(request: Request):
-            openapi_definition = get_openapi(**openapi_kwargs)
-            if self.filter_tags:
-                used_tags = set()
-                for path in openapi_definition["paths"].values():
-                    for method in path.values():
-                        used_tags.update(method.get("tags", []))
-                openapi_definition["tags"] = [
-                    t for t in openapi_definition["tags"] if t["name"] in used_tags
-                ]
-            return JSONResponse(openapi_definition)
+    def _create_openapi_endpoint(
+        self, version: str, routes: Sequence[BaseRoute]
+    ) -> Callable[[Request], Awaitable[Response]]:
+        """Creates the endpoint of the versioned openapi route."""
+        self._openapi_kwargs[version] = self._get_openapi_kwargs(version, routes)
 
+        async def get_versioned_openapi(request: Request) -> Response:
+            content = await self._get_openapi_content_async(version)
+            return content.response(request, self.cache_control)
+
+        return get_versioned_openapi
+
+    def _add_openapi_route(
+        self, version: str, router: APIRouter, routes: List[APIRoute]
+    ):
+        """Adds an openapi route to the router, the routes of the version are passed without version prefix."""
         router.add_route(
             router.prefix + self.app.openapi_url,  # type: ignore
-            get_versioned_openapi,
+            self._create_openapi_endpoint(version, routes),
             include_in_schema=False,
         )
 
-    def _override_swagger_docs(self, versions: List[str]):
-        """Overwrites the swagger docs to enable a dropdown menu for version selection."""
+    def _get_main_openapi(self) -> Dict[str, Any]:
+        """
+        Generates the main openapi definition like FastAPI.openapi() does, including the dispatched routes. The
+        models of the versioned routes' embedded bodies are named after their prefixed paths, as endpoints of different
+        versions might have equal names and paths.
+        """
+        if not self.app.openapi_schema:
+            routes: List[BaseRoute] = []
+            for route in self.app.routes:
+                if isinstance(route, VersionDispatcher):
+                    for version in self._get_openapi_versions():
+                        routes.extend(
+                            rename_body_field(r) if isinstance(r, APIRoute) else r
+                            for r in self._get_openapi_routes(version)
+                        )
+                elif id(route) in self._versions_by_route:
+                    routes.append(rename_body_field(route))  # type: ignore[arg-type]
+                else:
+                    routes.append(route)
+            self.app.openapi_schema = get_openapi(
+                **self._get_openapi_kwargs(None, routes)
+            )
+        return self.app.openapi_schema
 
-        async def get_versioned_swagger_ui_html(request: Request) -> HTMLResponse:
-            root_path = request.scope.get("root_path", "").rstrip("/")
-            openapi_url = f"{root_path}{self.app.openapi_url}"
-            oauth2_redirect_url = (
-                self.app.swagger_ui_oauth2_redirect_url
-                and root_path + self.app.swagger_ui_oauth2_redirect_url
+    def openapi(self, version: Union[int, str]) -> Dict[str, Any]:
+        """
+        Generates the openapi definition of a single version.
+
+        :param version:
+            The version to generate the openapi definition for. Unknown versions raise a ValueError.
+        :return:
+            The openapi definition as dict.
+        """
+        version = str(version)
+        self._check_versions([version])
+        self._create_lazy_versions([version])
+        if self.slice_openapi:
+            paths = self._get_sliced_paths(version)
+            openapi_definition = slice_openapi(
+                {**self._get_openapi_source(), "paths": paths},
+                get_openapi(**{**self._openapi_kwargs[version], "routes": []}),
+                paths,
+            )
+        else:
+            openapi_definition = get_openapi(
+                **{
+                    **self._openapi_kwargs[version],
+                    "routes": self._get_openapi_routes(version),
+                }
             )
+        if self.filter_tags and "tags" in openapi_definition:
+            used_tags = set()
+            for path in openapi_definition["paths"].values():
+                for method in path.values():
+                    used_tags.update(method.get("tags", []))
+            openapi_definition["tags"] = [
+                t for t in openapi_definition["tags"] if t["name"] in used_tags
+            ]
+        return openapi_definition
+
+    def diff(
+        self, from_version: Union[int, str], to_version: Union[int, str]
+    ) -> Dict[str, Any]:
+        """
+        Compares the routes of two versions without generating their openapi definitions.
+        Routes are compared by their endpoint and by hashes of their parameters, security requirements and models, which
+        are described by their fields instead of JSON schemas.
 
-            title = self.app.title + " - Swagger UI"
-            swagger_js_url = '"></script><script src="'.join(self.swagger_js_urls)
-            swagger_css_urls = '"><link type="text/css" rel="stylesheet" href="'.join(
-                self.swagger_css_urls
+        :param from_version:
+            The version to compare from, e.g. the older version.
+        :param to_version:
+            The version to compare to, e.g. the newer version.
+        :return:
+            The added, removed and changed routes by path without version prefix and method, e.g.
+            {"from": "1", "to": "2", "added": [{"path": "/items", "method": "POST"}], "removed": [],
+            "changed": [{"path": "/items", "method": "GET", "changes": ["endpoint", "response"]}]}
+        """
+        key = (str(from_version), str(to_version))
+        result = self._diffs.get(key)
+        if result is None:
+            self._check_versions(key)
+            from_routes: Dict[Tuple[str, str], Dict[str, str]] = {}
+            to_routes: Dict[Tuple[str, str], Dict[str, str]] = {}
+            for (version, path, method), route in self._route_table.items():
+                if version in key:
+                    # The converted routes have the request and response models of the version
+                    signature = self._get_route_signature(
+                        self._get_converted_route(version, route)
+                    )
+                    if version == key[0]:
+                        from_routes[path, method] = signature
+                    if version == key[1]:
+                        to_routes[path, method] = signature
+            result = self._diffs[key] = {
+                "from": key[0],
+                "to": key[1],
+                **diff_routes(from_routes, to_routes),
+            }
+        return result
+
+    def _get_route_signature(self, route: APIRoute) -> Dict[str, str]:
+        """Gets the signature of a route, computed once per route."""
+        signature = self._route_signatures.get(id(route))
+        if signature is None:
+            signature = self._route_signatures[id(route)] = get_route_signature(
+                route, self._model_descriptions
             )
+        return signature
+
+    def _add_metrics(self):
+        """Adds the middleware recording the request metrics and the metrics endpoint."""
+        self.app.add_middleware(
+            MetricsMiddleware, metrics=self.metrics, get_version=self._get_route_version
+        )
+        if self.metrics_url:
 
-            # Swagger api definition urls, see https://swagger.io/docs/open-source-tools/swagger-ui/usage/configuration/
-            versioned_openapi_urls = []
-            if self.include_main_openapi:
-                versioned_openapi_urls.append(
-                    {"name": "All Routes", "url": openapi_url}
+            async def get_metrics(request: Request) -> Response:
+                return PlainTextResponse(
+                    self.metrics.prometheus_text(),  # type: ignore[union-attr]
+                    media_type="text/plain; version=0.0.4",
                 )
-            versioned_openapi_urls.extend(
-                [
-                    {
-                        "name": f"Version {v}",
-                        "url": f"{root_path}{self.prefix_format.format(version=v)}{self.app.openapi_url}",
-                    }
-                    for v in versions
-                ]
-            )
-            swagger_ui_parameters = {
-                "layout": "StandaloneLayout",
-                "urls": versioned_openapi_urls,
+
+            self.app.add_route(self.metrics_url, get_metrics, include_in_schema=False)
+
+    def _get_route_version(self, scope: Scope) -> Union[Tuple[str, str], None]:
+        """Gets the version and the path without version prefix of the route matched by a request."""
+        route = scope.get("route")
+        if route is None:
+            return None
+        version = scope.get(VERSION_SCOPE_KEY)
+        if version is not None:
+            # Dispatched routes have no version prefix
+            return version, route.path
+        return self._versions_by_route.get(id(route))
+
+    def _add_versions_diff_route(self):
+        """Adds the endpoint comparing the routes of two versions."""
+
+        async def get_versions_diff(request: Request) -> Response:
+            try:
+                from_version = request.query_params["from"]
+                to_version = request.query_params["to"]
+            except KeyError:
+                raise HTTPException(
+                    400, 'The query parameters "from" and "to" are required.'
+                ) from None
+            try:
+                result = self._diffs.get((from_version, to_version))
+                if result is None:
+                    # Comparing the routes the first time takes a while for large apps
+                    result = await run_in_threadpool(
+                        self.diff, from_version, to_version
+                    )
+                return JSONResponse(result)
+            except ValueError as e:
+                raise HTTPException(404, str(e)) from e
+
+        self.app.add_route(
+            self.versions_diff_url,  # type: ignore
+            get_versions_diff,
+            include_in_schema=False,
+        )
+
+    def invalidate_openapi(self, version: Union[int, str, None] = None):
+        """
+        Invalidates cached openapi definitions, they will be generated again on the next request.
+
+        :param version:
+            The version to invalidate. If None, all versions and the main openapi definition will be invalidated.
+        """
+        self._openapi_source = None
+        if version is None:
+            self._openapi_cache.clear()
+            self.app.openapi_schema = None
+        elif self.shared_components:
+            # The shared components depend on the definitions of all versions
+            self._openapi_cache.clear()
+        else:
+            self._openapi_cache.pop(str(version), None)
+        self._components_content = None
+
+    def _get_openapi_source(self) -> Dict[str, Any]:
+        """
+        Returns the openapi definition of the distinct routes of all versions, which is used to slice the versions'
+        definitions. Each route is generated once, however many versions contain it, under a path unique to the route.
+        """
+        openapi_source = self._openapi_source
+        if openapi_source is None:
+            # The versions' definitions are generated concurrently, the first one generates the source
+            with self._openapi_source_lock:
+                openapi_source = self._openapi_source
+                if openapi_source is None:
+                    openapi_source = self._openapi_source = (
+                        self._create_openapi_source()
+                    )
+        return openapi_source
+
+    def _create_openapi_source(self) -> Dict[str, Any]:
+        """Generates the openapi definition of the distinct routes of all versions and records their paths."""
+        versions = self._get_openapi_versions()
+        source_routes: Dict[int, APIRoute] = {}
+        for version in versions:
+            for route in self._openapi_kwargs[version]["routes"]:
+                converted_route = self._get_converted_route(version, route)
+                if id(converted_route) not in source_routes:
+                    source_routes[id(converted_route)] = copy_route(
+                        converted_route,
+                        f"/{len(source_routes)}",
+                        self.version_index.get_mount_path(route),
+                    )
+        self._source_paths = {k: r.path_format for k, r in source_routes.items()}
+        return get_openapi(
+            **{
+                **self._openapi_kwargs[versions[0]],
+                "routes": list(source_routes.values()),
             }
-            if self.primary_swagger_version:
-                swagger_ui_parameters["urls.primaryName"] = (
-                    f"Version {self.primary_swagger_version}"
+        )
+
+    def _get_sliced_paths(self, version: str) -> Dict[str, Any]:
+        """Gets the paths of a version from the openapi source, with the version's paths and operationIds."""
+        source_paths = self._get_openapi_source()["paths"]
+        version_prefix = self.prefix_format.format(version=version)
+        paths: Dict[str, Any] = {}
+        for route in self._openapi_kwargs[version]["routes"]:
+            mount_path = self.version_index.get_mount_path(route)
+            route = self._get_converted_route(version, route)
+            path_item = source_paths.get(self._source_paths[id(route)])
+            if path_item is None:
+                # Routes excluded from the schema have no path
+                continue
+            operation_id = get_prefixed_unique_id(route, version_prefix, mount_path)
+            paths.setdefault(
+                mount_path + version_prefix + route.path_format, {}
+            ).update(
+                {
+                    method: {**operation, "operationId": operation_id}
+                    for method, operation in path_item.items()
+                }
+            )
+        return paths
+
+    def warmup(
+        self,
+        versions: Union[Iterable[Union[int, str]], None] = None,
+        openapi: bool = True,
+    ):
+        """
+        Creates lazy versions and generates their openapi definitions in advance, e.g. on startup.
+
+        :param versions:
+            The versions to warm up. If None, all versions will be warmed up. Unknown versions raise a ValueError.
+        :param openapi:
+            If True, the openapi definitions of the versions will be generated and cached as well.
+        """
+        versions = None if versions is None else [str(v) for v in versions]
+        if versions is not None:
+            self._check_versions(versions)
+        self._create_lazy_versions(versions)
+        if openapi and self.app.openapi_url:
+            for version in (
+                self.version_index.versions if versions is None else versions
+            ):
+                self._get_openapi_content(version)
+
+    def _check_versions(self, versions: Iterable[str]):
+        """Raises a ValueError, if a version is unknown."""
+        for version in versions:
+            if not self.version_index.has_version(version):
+                raise ValueError(f'Unknown version "{version}".')
+
+    def _create_lazy_versions(self, versions: Union[Iterable[str], None] = None):
+        """Creates the routes of lazy versions, which were not requested yet. If versions is None, all are created."""
+        if self._dispatcher is not None:
+            for version in (
+                self.version_index.versions if versions is None else versions
+            ):
+                self._dispatcher.get_routes(version)
+
+    def _get_openapi_versions(self) -> List[str]:
+        """Gets the versions with openapi definition in the order of their routes, independent of lazy creation."""
+        self._create_lazy_versions()
+        return [v for v in self.version_index.versions if v in self._openapi_kwargs]
+
+    def _get_openapi_content(self, version: str) -> CachedContent:
+        """Returns the serialized openapi definition of a version, generated once and cached afterwards."""
+        content = self._openapi_cache.get(version)
+        if content is None:
+            path = self.openapi_dir and self._get_export_path(
+                self.openapi_dir, self._get_versioned_openapi_url(version)
+            )
+            if path and path.is_file():
+                content = CachedContent.read(path, "application/json")
+            elif self.shared_components:
+                return self._create_shared_components()[version]
+            elif self._file_cache:
+                content = self._file_cache.get(
+                    self._get_cache_key(version),
+                    "application/json",
+                    lambda: self._create_openapi_content(version),
+                )
+            else:
+                content = self._create_openapi_content(version)
+            self._openapi_cache[version] = content
+        return content
+
+    def _create_openapi_content(self, version: str) -> CachedContent:
+        """Generates and serializes the openapi definition of a version."""
+        if self.stream_openapi:
+            return ChunkedContent(
+                iter_json_chunks(self.openapi(version), self.serializer),
+                "application/json",
+                self.compression_minimum_size,
+                chunk_size=self.openapi_chunk_size,
+            )
+        return CachedContent(
+            self.serializer(self.openapi(version)),
+            "application/json",
+            self.compression_minimum_size,
+        )
+
+    def _get_cache_key(self, version: str) -> str:
+        """
+        Gets the file name of the openapi definition of a version, which changes if its routes or settings change.
+        The routes are described by their attributes and signatures, which do not require generating JSON schemas.
+        """
+        self._create_lazy_versions([version])
+        openapi_kwargs = self._openapi_kwargs[version]
+        version_prefix = self.prefix_format.format(version=version)
+        routes = [
+            [
+                self.version_index.get_mount_path(route),
+                self._describe_openapi_route(self._get_converted_route(version, route)),
+            ]
+            for route in openapi_kwargs["routes"]
+            if isinstance(route, APIRoute)
+        ]
+        webhooks = [
+            self._describe_openapi_route(route)
+            for route in openapi_kwargs.get("webhooks", [])
+            if isinstance(route, APIRoute)
+        ]
+        settings = {
+            k: v for k, v in openapi_kwargs.items() if k not in ("routes", "webhooks")
+        }
+        options = [
+            __version__,
+            fastapi.__version__,
+            self.filter_tags,
+            self.slice_openapi,
+            self.compression_minimum_size,
+            getattr(self.serializer, "__qualname__", repr(self.serializer)),
+        ]
+        return f"openapi-{hash_value([options, settings, version_prefix, routes, webhooks])}.json"
+
+    def _describe_openapi_route(self, route: APIRoute) -> List[Any]:
+        """Describes the attributes of a route, which affect its openapi definition, including its callbacks."""
+        return [
+            route.path,
+            sorted(route.methods),
+            route.unique_id,
+            route.name,
+            route.summary,
+            route.description,
+            route.response_description,
+            route.tags,
+            route.deprecated,
+            route.include_in_schema,
+            route.responses,
+            route.openapi_extra,
+            self._get_route_signature(route),
+            [
+                self._describe_openapi_route(c)
+                for c in route.callbacks or []
+                if isinstance(c, APIRoute)
+            ],
+        ]
+
+    def _get_components_content(self) -> CachedContent:
+        """Returns the serialized document of the shared components, generated once and cached afterwards."""
+        content = self._components_content
+        if content is None:
+            path = self.openapi_dir and self._get_export_path(
+                self.openapi_dir, self.shared_components_url
+            )
+            if path and path.is_file():
+                content = self._components_content = CachedContent.read(
+                    path, "application/json"
                 )
-            if self.app.swagger_ui_parameters:
-                swagger_ui_parameters.update(self.app.swagger_ui_parameters)
+            else:
+                self._create_shared_components()
+                content = self._components_content
+        return content  # type: ignore[return-value]
 
-            optional_kwargs = {}
-            if self.swagger_favicon_url:
-                optional_kwargs["swagger_favicon_url"] = self.swagger_favicon_url
+    def _create_shared_components(self) -> Dict[str, CachedContent]:
+        """
+        Generates the openapi definitions of all versions and moves their shared component schemas to a separate
+        document. The serialized definitions and the document are cached.
+        """
+        with self._components_lock:
+            contents = {
+                v: self._openapi_cache.get(v) for v in self.version_index.versions
+            }
+            if self._components_content is not None and all(contents.values()):
+                return contents  # type: ignore[return-value]
 
-            # It might be better to override get_swagger_ui_html completely instead of modifying its response...
-            html_response = get_swagger_ui_html(
-                openapi_url=openapi_url,
-                title=title,
-                swagger_js_url=swagger_js_url,
-                swagger_css_url=swagger_css_urls,
-                oauth2_redirect_url=oauth2_redirect_url,
-                swagger_ui_parameters=swagger_ui_parameters,
-                **optional_kwargs,
+            definitions, schemas = share_components(
+                {v: self.openapi(v) for v in self.version_index.versions},
+                {
+                    v: posixpath.relpath(
+                        self.shared_components_url,
+                        posixpath.dirname(self._get_versioned_openapi_url(v)),
+                    )
+                    for v in self.version_index.versions
+                },
+            )
+            for version, definition in definitions.items():
+                contents[version] = self._openapi_cache[version] = CachedContent(
+                    self.serializer(definition),
+                    "application/json",
+                    self.compression_minimum_size,
+                )
+            components_definition = get_openapi(
+                **{**self._get_openapi_kwargs(None, []), "title": self.app.title}
+            )
+            components_definition["components"] = {"schemas": schemas}
+            self._components_content = CachedContent(
+                self.serializer(
+                    {
+                        k: components_definition[k]
+                        for k in OPENAPI_KEYS
+                        if k in components_definition
+                    }
+                ),
+                "application/json",
+                self.compression_minimum_size,
             )
-            html_body = html_response.body.replace(
-                b"SwaggerUIBundle.SwaggerUIStandalonePreset",
-                b"SwaggerUIStandalonePreset",
+            return contents  # type: ignore[return-value]
+
+    def _add_shared_components_route(self):
+        """Adds the route of the document containing the shared component schemas."""
+
+        async def get_shared_components(request: Request) -> Response:
+            content = self._components_content
+            if content is None:
+                content = await run_in_threadpool(self._get_components_content)
+            return content.response(request, self.cache_control)
+
+        self.app.add_route(
+            self.shared_components_url, get_shared_components, include_in_schema=False
+        )
+
+    def _get_versioned_openapi_url(self, version: str) -> str:
+        """Gets the url of the openapi definition of a version, without root path."""
+        return f"{self.prefix_format.format(version=version)}{self.app.openapi_url}"
+
+    @staticmethod
+    def _get_export_path(directory: Path, url: str) -> Path:
+        """Gets the path of an exported url, urls without file extension are exported as index.html."""
+        path = directory / url.lstrip("/")
+        return path if path.suffix else path / "index.html"
+
+    def export(
+        self, directory: Union[str, "os.PathLike[str]"], *, root_path: str = ""
+    ) -> List[Path]:
+        """
+        Writes the openapi definitions of all versions, including compressed variants, and the swagger docs to a
+        directory, e.g. to be served by a web server. The paths of the files equal the urls, e.g. "v1/openapi.json",
+        urls without file extension like "/docs" are written as "docs/index.html". Requires version_fastapi() to be
+        called before.
+
+        :param directory:
+            The directory to write the files to.
+        :param root_path:
+            The root path the app will be served at, used by the swagger docs to load the openapi definitions.
+        :return:
+            The paths of the written uncompressed files.
+        """
+        directory = Path(directory)
+        contents: Dict[str, CachedContent] = {}
+        if self.app.openapi_url:
+            contents[self.app.openapi_url] = CachedContent(
+                self.serializer(self.app.openapi()),
+                "application/json",
+                self.compression_minimum_size,
             )
-            html_body = html_body.replace(
-                b"<body>", b"<body style='margin:0;padding:0'>"
+            for version in self.version_index.versions:
+                contents[self._get_versioned_openapi_url(version)] = (
+                    self._get_openapi_content(version)
+                )
+            if self.shared_components:
+                contents[self.shared_components_url] = self._get_components_content()
+            if self.app.docs_url:
+                contents[self.app.docs_url] = CachedContent(
+                    self._get_swagger_ui_html(
+                        self._sort_versions(self.version_index.versions), root_path
+                    ),
+                    HTMLResponse.media_type,
+                )
+                for name in self._swagger_ui_media_types:
+                    contents[f"{self._swagger_ui_url}/{name}"] = (
+                        self._get_swagger_ui_asset(name)
+                    )
+
+        paths = []
+        for url, content in contents.items():
+            path = self._get_export_path(directory, url)
+            content.write(path)
+            paths.append(path)
+        return paths
+
+    async def _get_openapi_content_async(self, version: str) -> CachedContent:
+        """
+        Returns the serialized openapi definition of a version, without blocking the event loop.
+
+        The definition is generated in a thread, which is detached from the requests. Concurrent requests of the same
+        version share a single generation, even if they are handled by different event loops. A cancelled request,
+        e.g. due to a client disconnect, neither cancels the generation nor fails the other requests.
+        """
+        content = self._openapi_cache.get(version)
+        if content is not None:
+            return content
+
+        with self._openapi_lock:
+            future = self._openapi_futures.get(version)
+            if future is None:
+                future = self._openapi_futures[version] = Future()
+                # A running future cannot be cancelled by cancelled waiters of asyncio.wrap_future
+                future.set_running_or_notify_cancel()
+                asyncio.get_running_loop().run_in_executor(
+                    None, self._generate_openapi_content, version, future
+                )
+        return await asyncio.wrap_future(future)
+
+    def _generate_openapi_content(self, version: str, future: "Future[CachedContent]"):
+        """Generates the openapi definition of a version and completes the future shared by its requests."""
+        try:
+            content = self._get_openapi_content(version)
+        except BaseException as e:
+            with self._openapi_lock:
+                del self._openapi_futures[version]
+            future.set_exception(e)
+        else:
+            with self._openapi_lock:
+                del self._openapi_futures[version]
+            future.set_result(content)
+
+    def _override_swagger_docs(self):
+        """Overwrites the swagger docs to enable a dropdown menu for version selection."""
+
+        # The docs only depend on the root path, which is the same for nearly all requests
+        @functools.lru_cache(maxsize=self.max_docs_root_paths)
+        def get_docs_content(root_path: str) -> CachedContent:
+            return CachedContent(
+                self._get_swagger_ui_html(
+                    self._sort_versions(self.version_index.versions), root_path
+                ),
+                HTMLResponse.media_type,
             )
-            return HTMLResponse(html_body)
+
+        self._docs_contents = get_docs_content
+
+        async def get_versioned_swagger_ui_html(request: Request) -> Response:
+            content = get_docs_content(request.scope.get("root_path", ""))
+            return content.response(request, self.cache_control)
 
         self.app.add_route(
             self.app.docs_url,  # type: ignore
             get_versioned_swagger_ui_html,
             include_in_schema=False,
         )
+        if self.swagger_ui_dir is not None:
+            self._add_swagger_ui_route()
+
+    def _add_swagger_ui_route(self):
+        """
+        Adds a route serving the files of swagger_ui_dir. The files are only hashed on startup, they are loaded and
+        compressed once on their first request.
+        """
+        swagger_ui_dir = Path(self.swagger_ui_dir)  # type: ignore[arg-type]
+        files_hash = hashlib.sha256()
+        self._swagger_ui_assets = {}
+        self._swagger_ui_media_types = {}
+        for name in self.swagger_ui_files:
+            files_hash.update((swagger_ui_dir / name).read_bytes())
+            self._swagger_ui_media_types[name] = (
+                mimetypes.guess_type(name)[0] or "application/octet-stream"
+            )
+        # The files never change at the same URL, so they can be cached forever
+        self._swagger_ui_url = f"{self.swagger_ui_url}/{files_hash.hexdigest()[:16]}"
+
+        async def get_swagger_ui_file(request: Request) -> Response:
+            name = request.path_params["name"]
+            if name not in self._swagger_ui_media_types:
+                return Response(status_code=404)
+            content = self._swagger_ui_assets.get(name)
+            if content is None:
+                content = await run_in_threadpool(self._get_swagger_ui_asset, name)
+            return content.response(request, "public, max-age=31536000, immutable")
+
+        self.app.add_route(
+            self._swagger_ui_url + "/{name}",
+            get_swagger_ui_file,
+            include_in_schema=False,
+        )
+
+    def _get_swagger_ui_asset(self, name: str) -> CachedContent:
+        """Gets a file of swagger_ui_dir, which is loaded and compressed on the first call."""
+        content = self._swagger_ui_assets.get(name)
+        if content is None:
+            media_type = self._swagger_ui_media_types[name]
+            content = self._swagger_ui_assets[name] = CachedContent(
+                (Path(self.swagger_ui_dir) / name).read_bytes(),  # type: ignore[arg-type]
+                media_type,
+                self.compression_minimum_size
+                if media_type.startswith(("text/", "application/javascript"))
+                else None,
+            )
+        return content
+
+    def _get_swagger_ui_html(self, versions: List[str], root_path: str) -> bytes:
+        """Renders the swagger docs with a dropdown menu for version selection."""
+        root_path = root_path.rstrip("/")
+        openapi_url = f"{root_path}{self.app.openapi_url}"
+        oauth2_redirect_url = (
+            self.app.swagger_ui_oauth2_redirect_url
+            and root_path + self.app.swagger_ui_oauth2_redirect_url
+        )
+
+        title = self.app.title + " - Swagger UI"
+        swagger_js_urls = self.swagger_js_urls
+        swagger_css_urls = self.swagger_css_urls
+        swagger_favicon_url = self.swagger_favicon_url
+        if self._swagger_ui_url is not None:
+            swagger_ui_url = root_path + self._swagger_ui_url
+            urls_by_suffix: Dict[str, List[str]] = defaultdict(list)
+            for name in self._swagger_ui_media_types:
+                urls_by_suffix[Path(name).suffix].append(f"{swagger_ui_url}/{name}")
+            swagger_js_urls = urls_by_suffix[".js"]
+            swagger_css_urls = urls_by_suffix[".css"]
+            swagger_favicon_url = next(iter(urls_by_suffix[".png"]), None)
+        swagger_js_url = '"></script><script src="'.join(swagger_js_urls)
+        swagger_css_url = '"><link type="text/css" rel="stylesheet" href="'.join(
+            swagger_css_urls
+        )
+
+        # Swagger api definition urls, see https://swagger.io/docs/open-source-tools/swagger-ui/usage/configuration/
+        versioned_openapi_urls = []
+        if self.include_main_openapi:
+            versioned_openapi_urls.append({"name": "All Routes", "url": openapi_url})
+        versioned_openapi_urls.extend(
+            [
+                {
+                    "name": f"Version {v}",
+                    "url": root_path + self._get_versioned_openapi_url(v),
+                }
+                for v in versions
+            ]
+        )
+        swagger_ui_parameters = {
+            "layout": "StandaloneLayout",
+            "urls": versioned_openapi_urls,
+        }
+        if self.primary_swagger_version:
+            swagger_ui_parameters["urls.primaryName"] = (
+                f"Version {self.primary_swagger_version}"
+            )
+        if self.app.swagger_ui_parameters:
+            swagger_ui_parameters.update(self.app.swagger_ui_parameters)
+
+        optional_kwargs = {}
+        if swagger_favicon_url:
+            optional_kwargs["swagger_favicon_url"] = swagger_favicon_url
+
+        # It might be better to override get_swagger_ui_html completely instead of modifying its response...
+        html_response = get_swagger_ui_html(
+            openapi_url=openapi_url,
+            title=title,
+            swagger_js_url=swagger_js_url,
+            swagger_css_url=swagger_css_url,
+            oauth2_redirect_url=oauth2_redirect_url,
+            swagger_ui_parameters=swagger_ui_parameters,
+            **optional_kwargs,
+        )
+        html_body = html_response.body.replace(
+            b"SwaggerUIBundle.SwaggerUIStandalonePreset",
+            b"SwaggerUIStandalonePreset",
+        )
+        return html_body.replace(b"<body>", b"<body style='margin:0;padding:0'>")
@@ -0,0 +1,96 @@
+import bisect
+import re
+from typing import Any, Callable, Iterable, List, Tuple, Union
+
+VERSION_PART_PATTERN = re.compile(r"[0-9]+|[^\W0-9_]+")
+RANGE_OPERATORS = (">=", "<=", "==", ">", "<")
+"""The operators of version ranges, two character operators first, as they start with one character operators."""
+
+
+def get_version_key(version: str) -> Tuple[Tuple[int, Union[int, str]], ...]:
+    """
+    Gets a sort key of a version, which compares the numbers in it numerically and other parts alphabetically.
+    E.g. "2" < "10", "1.2.0" < "1.10.0" and "2024-01-31" < "2024-02-01".
+    """
+    return tuple(
+        (0, int(part)) if part.isdigit() else (1, part)
+        for part in VERSION_PART_PATTERN.findall(version)
+    )
+
+
+class VersionRange:
+    """A range of versions like ">=2,<5", which is expanded to the matching known versions."""
+
+    __slots__ = ("conditions",)
+
+    def __init__(self, conditions: Iterable[Tuple[str, str]]):
+        """
+        :param conditions:
+            The operators and versions, which all must match, e.g. [(">=", "2"), ("<", "5")].
+        """
+        self.conditions = tuple(conditions)
+        for operator, _ in self.conditions:
+            if operator not in RANGE_OPERATORS:
+                raise ValueError(f'Unknown version range operator "{operator}".')
+
+    @classmethod
+    def parse(cls, spec: str) -> "VersionRange":
+        """Parses a range like ">=2,<5" or "<=2024-06-30"."""
+        conditions = []
+        for condition in spec.split(","):
+            condition = condition.strip()
+            operator = next((o for o in RANGE_OPERATORS if condition.startswith(o)), "")
+            version = condition[len(operator) :].strip()
+            if not operator or not version:
+                raise ValueError(
+                    f'Invalid version range "{spec}", expected e.g. ">=2,<5".'
+                )
+            conditions.append((operator, version))
+        return cls(conditions)
+
+    def __repr__(self) -> str:
+        return f'VersionRange("{",".join(o + v for o, v in self.conditions)}")'
+
+
+def parse_version(version: Union[int, str]) -> Union[str, VersionRange]:
+    """Parses a version of the @version annotation, which is a range if it starts with an operator."""
+    version = str(version)
+    if version.startswith(("<", ">", "=")):
+        return VersionRange.parse(version)
+    return version
+
+
+class VersionSet:
+    """The known versions in ascending order, expanding ranges via bisection."""
+
+    __slots__ = ("versions", "keys", "version_key")
+
+    def __init__(
+        self,
+        versions: Iterable[str],
+        version_key: Callable[[str], Any] = get_version_key,
+    ):
+        """
+        :param versions:
+            The known versions, duplicates are ignored.
+        :param version_key:
+            Gets the sort key of a version.
+        """
+        self.version_key = version_key
+        self.versions: List[str] = sorted(set(versions), key=version_key)
+        self.keys = [version_key(v) for v in self.versions]
+
+    def expand(self, version_range: VersionRange) -> List[str]:
+        """Gets the known versions within a range in ascending order."""
+        start, stop = 0, len(self.versions)
+        for operator, version in version_range.conditions:
+            key = self.version_key(version)
+            if operator in (">=", "=="):
+                start = max(start, bisect.bisect_left(self.keys, key))
+            elif operator == ">":
+                start = max(start, bisect.bisect_right(self.keys, key))
+            if operator in ("<=", "=="):
+                stop = min(stop, bisect.bisect_right(self.keys, key))
+            elif operator == "<":
+                stop = min(stop, bisect.bisect_left(self.keys, key))
+        return self.versions[start:stop]